@@ -1,9 +1,11 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, Response, stream_with_context
 from core.device_manager import DeviceManager
+from core.event_hub import EventHub, format_event, parse_event_id
+from core.event_server import EventServer
+from core.executor import ActionExecutor, ExecutorFull
 from audio.clap_listener import ClapDetector
-from plugins.chromecast.chromecast_driver import ChromecastDevice
-import queue
 import json
+import os
 from pathlib import Path
 
 STATIONS_PATH = Path(__file__).parent / "static" / "radio_stations.json"
@@ -14,9 +16,37 @@ def load_stations():
 
 RADIO_STATIONS = load_stations()
 
-clap_events = queue.Queue()
+# clap and status events, broadcast to every open tab of the device they happened on
+device_events = EventHub()
 clap_detectors = {}
 
+# every device command goes through here: a bounded pool, one lane per device
+action_executor = ActionExecutor(workers=int(os.environ.get("ACTION_WORKERS", 4)),
+                                 timeout=float(os.environ.get("ACTION_TIMEOUT", 15)))
+
+SIMPLE_ACTIONS = ("turn_on", "turn_off", "toggle", "mute", "unmute", "volume_up", "volume_down",
+                  "launch_youtube", "launch_netflix", "launch_spotify")
+
+# action -> (device method, request field it needs, error if missing)
+ARG_ACTIONS = {
+    "play_media": ("play_media", "url", "Missing URL"),
+    "play_youtube": ("play_youtube", "query", "Missing search term or URL"),
+    "set_volume": ("volume", "level", "Missing Level"),
+    "playback": ("playback", "cmd", "Missing Command"),
+}
+
+def parse_action(action, data):
+    """(device method, args) for an action request, or ValueError with the message for a 400"""
+    if action in SIMPLE_ACTIONS:
+        return action, ()
+    if action in ARG_ACTIONS:
+        method, field, missing = ARG_ACTIONS[action]
+        value = data.get(field)
+        if value is None or value == "":
+            raise ValueError(missing)
+        return method, (value,)
+    raise ValueError(f"Unknown Action {action}")
+
 def create_app(config=None):
     app = Flask(__name__)
     cfg = config or {}
@@ -25,8 +55,29 @@ def create_app(config=None):
     )
 
     manager = DeviceManager()
+
+    def publish_status(device, status):
+        device_events.publish(device.name, json.dumps({"name": device.name, "status": status}), type="status")
+
+    manager.add_status_listener(publish_status)
     manager.load()
 
+    # SSE streams are served from an asyncio loop on their own port so open tabs
+    # don't each hold a Flask worker; EVENTS_PORT=0 keeps them on the Flask route
+    events_port = int(cfg.get('EVENTS_PORT', os.environ.get('EVENTS_PORT', 5001)))
+    event_server = EventServer(device_events, port=events_port) if events_port else None
+
+    @app.before_request
+    def start_event_server():
+        # started with the first request, so the reloader's watcher process never binds the port
+        if event_server is not None:
+            event_server.start()
+
+    @app.context_processor
+    def inject_events_port():
+        running = event_server is not None and event_server.running
+        return {"events_port": event_server.port if running else None}
+
     @app.route("/")
     def index():
         global clap_detectors
@@ -37,9 +88,7 @@ def create_app(config=None):
         
         clap_detectors.clear()
 
-        raw_casts = ChromecastDevice.discover()
-        manager.devices = {cast.name: cast for cast in raw_casts}
-
+        # the registry is kept current in the background, so this never waits on discovery
         devices = manager.list_devices()
         return render_template("index.html", devices = devices)
 
@@ -62,16 +111,18 @@ def create_app(config=None):
         else:
 
             def clap_trigger():
+                # runs on the CaptureEngine dispatcher thread, so only queue the command; a burst of claps coalesces
                 app.logger.info(f"[Clap] Detected -> turning on {device.name}")
-                clap_events.put(device.name) 
+                device_events.publish(device.name, device.name)
                 try:
-                    device.turn_on()
-                except Exception as e:
+                    action_executor.submit(device.name, "turn_on", device.turn_on)
+                except ExecutorFull as e:
                     app.logger.error(f"[Clap] Error turning on device {device.name}: {e}")
 
             new_detector = ClapDetector(clap_trigger)
-            new_detector.start()
-            clap_detectors[name] = new_detector
+            # without a working microphone the page still renders, just without clap control
+            if new_detector.start():
+                clap_detectors[name] = new_detector
             
             status = device.get_status()
  
@@ -87,61 +138,74 @@ def create_app(config=None):
         action = data.get("action")
 
         try:
-            if action in ("turn_on", "turn_off", "toggle", "mute", "unmute",
-                        "launch_youtube", "launch_netflix", "launch_spotify"):
-                getattr(device, action)()
-            elif action == "play_media":
-                url = data.get("url")
-                if not url:
-                    return jsonify({"error": "Missing URL"}), 400
-                device.play_media(url)
-
-            elif action == "play_youtube":
-                query = data.get("query")
-                if not query:
-                    return jsonify({"error": "Missing search term or URL"}), 400
-                device.play_youtube(query)
-
-            elif action == "set_volume":
-                lvl = data.get("level")
-                if lvl is None:
-                    return jsonify({"error": "Missing Level"}), 400
-                device.volume(lvl)
-
-            elif action == "volume_up":
-                device.volume_up()
-            elif action == "volume_down":
-                device.volume_down()
-
-            elif action == "playback":
-                cmd = data.get("cmd")
-                if not cmd:
-                    return jsonify({"error": "Missing Command"}), 400
-                device.playback(cmd)
-
-            else:
-                return jsonify({"error": f"Unknown Action {action}"}), 400
+            method, args = parse_action(action, data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-            status = device.get_status()
-            return jsonify({"status": status})
+        try:
+            job = action_executor.submit(device.name, action, getattr(device, method), *args)
+        except ExecutorFull as e:
+            return jsonify({"error": str(e)}), 429
+
+        # {"async": true} returns the job id straight away; poll /api/jobs/<id> for the outcome
+        if data.get("async") or request.args.get("async"):
+            response = jsonify({"job": job.id, "state": job.state})
+            response.headers["Location"] = url_for("job_status", job_id=job.id)
+            return response, 202
+
+        if not job.wait() or job.state == "expired":
+            return jsonify({"error": f"Timed out running {action}", "job": job.id}), 504
+        if job.state == "failed":
+            app.logger.error(f"Error running action {action}: {job.error}")
+            return jsonify({"error": job.error, "job": job.id}), 500
 
+        try:
+            status = device.get_status()
         except Exception as e:
-            app.logger.error(f"Error running action {action}: {e}", exc_info = True)
-            return jsonify({"error": str(e)}), 500  
+            app.logger.error(f"Error getting status after {action}: {e}", exc_info = True)
+            return jsonify({"error": str(e), "job": job.id}), 500
+        return jsonify({"status": status, "job": job.id})
+
+    @app.route("/api/jobs/<job_id>")
+    def job_status(job_id):
+        job = action_executor.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job.to_dict())
+
+    @app.route("/api/devices/status")
+    def devices_status():
+        # last_event_id lets a client follow this snapshot with /devices/events?last_event_id= without a gap
+        last_event_id = device_events.last_id
+        return jsonify({"devices": manager.statuses(), "last_event_id": last_event_id})
 
     @app.route("/device/<name>/events")
     def events(name):
-        def event_stream(device_name):
-            yield "retry: 1000\n\n"
-            yield ": connected\n\n"
-            while True:
-                try:
-                    n = clap_events.get(timeout=5) 
-                    yield f"data: {n}\n\n" 
-                except queue.Empty:
-                    yield ": ping\n\n"  
-
-        return Response(stream_with_context(event_stream(name)), content_type="text/event-stream")
+        return event_response({name})
+
+    @app.route("/devices/events")
+    def all_events():
+        return event_response(None)
+
+    def event_response(topics):
+        # browsers resend the last id they saw as a header; scripts.js passes it as a param
+        last_event_id = parse_event_id(request.headers.get("Last-Event-ID") or request.args.get("last_event_id"))
+
+        def event_stream():
+            subscription = device_events.subscribe(topics=topics, last_event_id=last_event_id)
+            try:
+                yield "retry: 1000\n\n"
+                yield ": connected\n\n"
+                while True:
+                    batch = subscription.get(timeout=5)
+                    if not batch:
+                        yield ": ping\n\n"
+                    for event in batch:
+                        yield format_event(event)
+            finally:
+                subscription.close()
+
+        return Response(stream_with_context(event_stream()), content_type="text/event-stream")
 
     return app
 
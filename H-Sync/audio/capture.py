@@ -0,0 +1,190 @@
+import logging
+import threading
+import numpy as n
+
+try:
+    import sounddevice as sd
+    HAS_SOUNDDEVICE = True
+except OSError:
+    HAS_SOUNDDEVICE = False
+
+
+class CaptureEngine:
+    """
+    one microphone input stream shared by every listener in the process
+
+    the audio callback only copies each block into a preallocated ring buffer
+    and wakes the dispatcher thread, which hands each subscriber a read-only
+    view of the new samples. the ring is stored twice end to end so any
+    window of up to `capacity` samples is one contiguous view, never a copy
+
+    the stream closes `idle_timeout` seconds after the last subscriber
+    leaves, so switching detectors between pages doesn't reopen the mic
+    """
+
+    def __init__(self, samplerate=44100, blocksize=1024, capacity_seconds=2.0, max_blocks=256, idle_timeout=2.0):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.capacity = int(samplerate * capacity_seconds)
+        self._ring = n.zeros(2 * self.capacity, dtype=n.float32)
+        self._view = self._ring.view()
+        self._view.flags.writeable = False
+
+        # per-block bookkeeping, also preallocated: start sample, length and adc time
+        self._block_start = n.zeros(max_blocks, dtype=n.int64)
+        self._block_frames = n.zeros(max_blocks, dtype=n.int64)
+        self._block_time = n.zeros(max_blocks, dtype=n.float64)
+        self._blocks_written = 0
+        self._samples_written = 0
+
+        self.overruns = 0
+        self.status_errors = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stream = None
+        self._thread = None
+        self._running = False
+        self.idle_timeout = idle_timeout
+        self._idle_timer = None
+
+    def subscribe(self, callback, start=True):
+        """
+        call callback(samples, adc_time) for every block; starts the stream on
+        first use unless start is False (replay feeds blocks with write/dispatch)
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+        if start:
+            try:
+                self.start()
+            except Exception:
+                self.unsubscribe(callback)
+                raise
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s != callback]
+            if self._subscribers or not self._running or self._idle_timer is not None:
+                return
+            # on a timer: this may be called from a subscriber on the dispatcher thread, which stop() joins
+            self._idle_timer = threading.Timer(self.idle_timeout, self.stop, kwargs={"if_idle": True})
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def start(self):
+        if not HAS_SOUNDDEVICE:
+            raise RuntimeError("SoundDevice not available")
+        with self._lock:
+            if self._running:
+                return
+            stream = None
+            try:
+                stream = sd.InputStream(samplerate=self.samplerate, blocksize=self.blocksize,
+                                        channels=1, dtype="float32", callback=self._callback)
+                stream.start()
+            except Exception as e:
+                # no input device, or it's busy: leave the engine stopped so a later start can retry
+                logging.error(f"[CaptureEngine] Could not open input stream: {e}")
+                if stream is not None:
+                    stream.close()
+                raise
+            self._stream = stream
+            self._running = True
+            self._thread = threading.Thread(target=self._dispatch, name="audio-capture", daemon=True)
+            self._thread.start()
+        logging.info("[CaptureEngine] Input stream opened")
+
+    def stop(self, if_idle=False):
+        """close the stream; with if_idle, only if nobody has subscribed since"""
+        with self._lock:
+            if if_idle and self._idle_timer is not threading.current_thread():
+                return  # someone subscribed after this timer was set
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if not self._running:
+                return
+            self._running = False
+            stream, self._stream = self._stream, None
+        self._wake.set()
+        stream.close()
+        self._thread.join(timeout=1.0)
+        self._thread = None
+        logging.info("[CaptureEngine] Input stream closed")
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            self.status_errors += 1
+        adc_time = time_info.inputBufferAdcTime
+        if adc_time <= 0:
+            # some host APIs don't report the adc time
+            adc_time = time_info.currentTime - frames / self.samplerate
+        self.write(indata[:, 0], adc_time)
+
+    def write(self, samples, adc_time):
+        """copy one block into the ring (the audio callback; also used to feed recorded audio)"""
+        frames = len(samples)
+        start = self._samples_written
+        pos = start % self.capacity
+        first = min(frames, self.capacity - pos)
+        ring = self._ring
+        # each sample goes to pos and pos + capacity
+        ring[pos:pos + first] = samples[:first]
+        ring[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+        if first < frames:
+            rest = frames - first
+            ring[:rest] = samples[first:]
+            ring[self.capacity:self.capacity + rest] = samples[first:]
+
+        slot = self._blocks_written % len(self._block_start)
+        self._block_start[slot] = start
+        self._block_frames[slot] = frames
+        self._block_time[slot] = adc_time
+        self._samples_written = start + frames
+        self._blocks_written += 1
+        self._wake.set()
+
+    def _dispatch(self):
+        dispatched = 0
+        while self._running:
+            self._wake.wait(0.5)
+            self._wake.clear()
+            dispatched = self.dispatch(dispatched)
+
+    def dispatch(self, dispatched):
+        """deliver every block after block number `dispatched`; returns the new count"""
+        written = self._blocks_written
+        oldest = max(written - len(self._block_start), 0)
+        if dispatched < oldest:
+            self.overruns += oldest - dispatched
+            dispatched = oldest
+        subscribers = self._subscribers
+        while dispatched < written:
+            slot = dispatched % len(self._block_start)
+            start = int(self._block_start[slot])
+            frames = int(self._block_frames[slot])
+            dispatched += 1
+            if self._samples_written - start > self.capacity:
+                # overwritten before we got to it
+                self.overruns += 1
+                continue
+            pos = start % self.capacity
+            samples = self._view[pos:pos + frames]
+            adc_time = float(self._block_time[slot])
+            for callback in subscribers:
+                try:
+                    callback(samples, adc_time)
+                except Exception as e:
+                    logging.error(f"[CaptureEngine] Subscriber error: {e}")
+        return dispatched
+
+
+capture_engine = CaptureEngine()
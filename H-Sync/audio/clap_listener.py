@@ -1,53 +1,71 @@
-import time
+import logging
 import numpy as n
-from threading import Thread
 
-try:
-    import sounddevice as sd
-    HAS_SOUNDDEVICE = True
-except OSError:
-    HAS_SOUNDDEVICE = False
+from audio.capture import HAS_SOUNDDEVICE, capture_engine
+from audio.onsets import OnsetDetector
+
+if not HAS_SOUNDDEVICE:
     print("ClapDetector: sounddevice/PortAudio not available; clap detection disabled.")
 
 class ClapDetector:
-    def __init__(self, callback, threshold = 20.0, decay_thresh = 3.0, cooldown = 1.0, clap_window = 0.6, max_duration = 0.4):
+    def __init__(self, callback, threshold = 0.06, decay_thresh = 0.01, flux_thresh = 2.0, cooldown = 1.0, clap_window = 0.6, max_duration = 0.4, engine = None):
         self.callback = callback
+        # every detector listens to the one shared input stream
+        self.engine = engine or capture_engine
+        # threshold and decay_thresh are frame rms levels, flux_thresh the relative spectral jump of an onset
         self.threshold = threshold
         self.decay_thresh = decay_thresh
+        self.flux_thresh = flux_thresh
         self.max_duration = max_duration
         self.cooldown = cooldown
         self.clap_window = clap_window
 
-        self.last_clap_time = 0.0
+        self.onsets = OnsetDetector(self.engine.samplerate)
+        self._loud = n.zeros(self.onsets.max_frames, dtype=bool)
+        self._onset = n.zeros(self.onsets.max_frames, dtype=bool)
+        self._quiet = n.zeros(self.onsets.max_frames, dtype=bool)
+
+        self.last_clap_time = float("-inf")
         self.clap_count = 0
         self.running = False
-        self.last_trigger = 0.0
+        self.last_trigger = float("-inf")
         self.in_transient = False
+        self.trans_start = 0.0
 
-        self.stream = None
-        self.thread = None
-
-
-    def _audio_callback(self, indata, frames, time_info, status):
-        if status:
-            print(f"[ClapDetector] Stream Status: {status}")
-
-        volume = n.linalg.norm(indata) * 10
-        now = time.time()
+    def _on_block(self, samples, adc_time):
+        # samples is a read-only view into the capture engine's ring buffer
+        onsets = self.onsets
+        k = onsets.process(samples, adc_time)
+        if not k:
+            return
 
-        if not self.in_transient:
-            if volume > self.threshold:
-                print(f"[ClapDetector] Volume: {volume:.3f}")
+        loud = self._loud[:k]
+        onset = self._onset[:k]
+        quiet = self._quiet[:k]
+        n.greater(onsets.rms[:k], self.threshold, out=loud)
+        n.greater(onsets.flux[:k], self.flux_thresh, out=onset)
+        n.logical_and(loud, onset, out=onset)
+        n.less_equal(onsets.rms[:k], self.decay_thresh, out=quiet)
+
+        # walk from edge to edge: one step per transient start or end, not per frame
+        i = 0
+        while i < k:
+            edges = quiet[i:] if self.in_transient else onset[i:]
+            if not edges.any():
+                return
+            i += int(edges.argmax())
+            if not self.in_transient:
                 self.in_transient = True
-                self.trans_start = now
-            return
-        
-        if volume > self.decay_thresh:
-            return
-        
+                self.trans_start = onsets.attack_time(i, self.threshold)
+                logging.debug(f"[ClapDetector] Onset rms={onsets.rms[i]:.3f} flux={onsets.flux[i]:.1f}")
+            else:
+                self.in_transient = False
+                self._transient_ended(onsets.frame_time(i))
+            i += 1
+
+    def _transient_ended(self, now):
         dur = now - self.trans_start
-        self.in_transient = False
-        print(f"[ClapDetector] Transient dur={dur:.3f}s")
+        logging.debug(f"[ClapDetector] Transient dur={dur:.3f}s")
 
         if dur <= self.max_duration:
             if now - self.last_clap_time > self.clap_window:
@@ -59,63 +77,47 @@ class ClapDetector:
                 self.clap_count = 1
 
             self.last_clap_time = now
-            print(f"[ClapDetector] clap_count={self.clap_count}")
+            logging.debug(f"[ClapDetector] clap_count={self.clap_count}")
 
             if self.clap_count == 2 and now - self.last_trigger > self.cooldown:
-                print("[ClapDetector] double‑clap detected!")
+                logging.info("[ClapDetector] double‑clap detected!")
                 self.last_trigger = now
-                Thread(target=self.callback, daemon=True).start()
+                # callbacks must return quickly (app.py queues the command on the action executor)
+                try:
+                    self.callback()
+                except Exception as e:
+                    logging.error(f"[ClapDetector] Callback error: {e}")
                 self.clap_count = 0
         else:
-            print("[ClapDetector] Ignored: transient too long")
-
-        return
+            logging.debug("[ClapDetector] Ignored: transient too long")
 
 
     def start(self):
+            """start listening; False (and still stopped) if the microphone can't be opened"""
             if not HAS_SOUNDDEVICE:
-                raise RuntimeError("SoundDevice not available")
+                logging.error("[ClapDetector] SoundDevice not available")
+                return False
             if self.running:
-                return
+                return True
             
             self.running = True
             self.clap_count = 0
-            self.last_trigger = 0.0
-            self.thread = Thread(target = self._run, daemon = True)
-            self.thread.start() # not to be confused with the overarching function start()
-
-
-    def _run(self):
-        if not HAS_SOUNDDEVICE:
-            return
-        try:
-            self.stream = sd.InputStream(channels = 1, callback = self._audio_callback)
-            with self.stream:
-                print("[ClapDetector] Stream opened and listening for claps")
-                while self.running:
-                    time.sleep(0.1)
-        except Exception as e:
-            print(f"[ClapDetector] Audio Stream Error: {e}")
+            self.last_trigger = float("-inf")
+            # the engine opens the input stream for its first subscriber and closes it after its last
+            try:
+                self.engine.subscribe(self._on_block)
+            except Exception as e:
+                self.running = False
+                logging.error(f"[ClapDetector] Could not start listening: {e}")
+                return False
+            print("[ClapDetector] Listening for claps")
+            return True
         
 
     def stop(self):
         if not self.running:
             return
 
-        print("[ClapDetector] Stopping detector...")
         self.running = False
-
-        if self.stream:
-            try:
-                self.stream.close()
-                print("[ClapDetector] Stream closed.")
-            except Exception as e:
-                print(f"[ClapDetector] Error closing stream: {e}")
-            self.stream = None
-
-        if self.thread:
-            self.thread.join(timeout=1.0)
-            print("[ClapDetector] Thread joined.")
-            self.thread = None
-
-        print("[ClapDetector] Detector fully stopped.")
\ No newline at end of file
+        self.engine.unsubscribe(self._on_block)
+        print("[ClapDetector] Detector stopped.")
\ No newline at end of file
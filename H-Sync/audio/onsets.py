@@ -0,0 +1,111 @@
+import numpy as n
+
+
+class OnsetDetector:
+    """
+    short-frame energy envelope and spectral flux over a stream of blocks
+
+    every call to process() slices the new samples (plus the tail of the last
+    block) into overlapping frames and fills `rms` and `flux` for each of
+    them in a few vectorized numpy calls. every array is allocated up front
+    and written with out=, so the audio path allocates no sample buffers.
+    flux is the positive spectral change from the previous frame, relative
+    to the previous frame's total magnitude, so a clap out of quiet scores
+    far higher than steady noise
+    """
+
+    def __init__(self, samplerate, frame=512, hop=256, max_block=4096):
+        self.samplerate = samplerate
+        self.frame = frame
+        self.hop = hop
+        self.max_block = max_block
+        self.max_frames = (max_block + frame - hop) // hop + 1
+        bins = frame // 2 + 1
+
+        # two sample buffers, swapped each call so carrying the tail never overlaps
+        self._buffers = [n.zeros(max_block + frame, dtype=n.float32) for _ in range(2)]
+        self._current = 0
+        self._length = 0
+        self._consumed = 0
+        self.start_time = 0.0
+
+        self._window = n.hanning(frame).astype(n.float32)
+        self._windowed = n.empty((self.max_frames, frame), dtype=n.float32)
+        self._spectrum = n.empty((self.max_frames, bins), dtype=n.complex64)
+        # row 0 holds the previous call's last frame
+        self._magnitude = n.zeros((self.max_frames + 1, bins), dtype=n.float32)
+        self._totals = n.zeros(self.max_frames + 1, dtype=n.float32)
+        self._denominator = n.empty(self.max_frames, dtype=n.float32)
+        self._rise = n.empty((self.max_frames, bins), dtype=n.float32)
+        self._abs = n.empty(frame, dtype=n.float32)
+        self._over = n.empty(frame, dtype=bool)
+
+        self.rms = n.zeros(self.max_frames, dtype=n.float32)
+        self.flux = n.zeros(self.max_frames, dtype=n.float32)
+
+    def process(self, samples, adc_time):
+        """
+        add a block whose first sample was captured at adc_time
+
+        returns k, the number of new frames in rms[:k] and flux[:k]. frame i
+        starts at frame_time(i); both stay valid until the next call
+        """
+        frames = len(samples)
+        if frames > self.max_block:
+            raise ValueError(f"block of {frames} samples is larger than max_block={self.max_block}")
+
+        buffer = self._buffers[self._current]
+        leftover = self._length - self._consumed
+        if self._consumed:
+            other = self._buffers[1 - self._current]
+            other[:leftover] = buffer[self._consumed:self._length]
+            self._current = 1 - self._current
+            buffer = other
+        buffer[leftover:leftover + frames] = samples
+        self._length = leftover + frames
+        self.start_time = adc_time - leftover / self.samplerate
+
+        if self._length < self.frame:
+            self._consumed = 0
+            return 0
+        k = (self._length - self.frame) // self.hop + 1
+        self._consumed = k * self.hop
+
+        framed = n.lib.stride_tricks.as_strided(
+            buffer, shape=(k, self.frame), strides=(self.hop * buffer.itemsize, buffer.itemsize), writeable=False)
+
+        rms = self.rms[:k]
+        n.einsum("ij,ij->i", framed, framed, out=rms)
+        n.divide(rms, self.frame, out=rms)
+        n.sqrt(rms, out=rms)
+
+        windowed = self._windowed[:k]
+        n.multiply(framed, self._window, out=windowed)
+        spectrum = self._spectrum[:k]
+        n.fft.rfft(windowed, axis=1, out=spectrum)
+        magnitude = self._magnitude[1:k + 1]
+        n.abs(spectrum, out=magnitude)
+        n.sum(magnitude, axis=1, out=self._totals[1:k + 1])
+
+        rise = self._rise[:k]
+        n.subtract(magnitude, self._magnitude[:k], out=rise)
+        n.maximum(rise, 0, out=rise)
+        flux = self.flux[:k]
+        n.sum(rise, axis=1, out=flux)
+        n.add(self._totals[:k], 1e-6, out=self._denominator[:k])
+        n.divide(flux, self._denominator[:k], out=flux)
+
+        self._magnitude[0] = self._magnitude[k]
+        self._totals[0] = self._totals[k]
+        return k
+
+    def frame_time(self, i):
+        return self.start_time + i * self.hop / self.samplerate
+
+    def attack_time(self, i, level):
+        """time of the first sample in frame i whose magnitude exceeds level"""
+        start = i * self.hop
+        n.abs(self._buffers[self._current][start:start + self.frame], out=self._abs)
+        n.greater(self._abs, level, out=self._over)
+        offset = int(self._over.argmax()) if self._over.any() else 0
+        return self.start_time + (start + offset) / self.samplerate
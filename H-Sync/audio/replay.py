@@ -0,0 +1,296 @@
+"""
+Offline replay for ClapDetector.
+
+Feeds a WAV file (or a synthetic recording of claps, double claps, noise and
+distractor sounds) through the capture engine and a detector as fast as the
+CPU allows, then scores the detected claps against labelled clap times:
+
+    python -m audio.replay run --synthetic --duration 120
+    python -m audio.replay run --wav room.wav --labels room.txt
+    python -m audio.replay sweep --synthetic --threshold 0.03,0.06,0.1 --decay-thresh 0.005,0.01,0.02
+
+Labels are one clap time (seconds) per line; Audacity label exports work too,
+only the first column is used. A WAV with no --labels uses <name>.txt next to
+it if there is one.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import wave
+
+import numpy as n
+
+from audio.capture import CaptureEngine
+from audio.clap_listener import ClapDetector
+
+PARAMETERS = ("threshold", "decay_thresh", "flux_thresh", "clap_window", "max_duration", "cooldown")
+
+
+def load_wav(path):
+    """mono float32 samples and the sample rate of a PCM wav"""
+    with wave.open(path, "rb") as f:
+        channels, width, samplerate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        samples = (n.frombuffer(raw, dtype=n.uint8).astype(n.float32) - 128) / 128
+    elif width == 2:
+        samples = n.frombuffer(raw, dtype="<i2").astype(n.float32) / 2 ** 15
+    elif width == 4:
+        samples = n.frombuffer(raw, dtype="<i4").astype(n.float32) / 2 ** 31
+    else:
+        raise ValueError(f"{path}: unsupported sample width {width * 8} bits")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return n.ascontiguousarray(samples, dtype=n.float32), samplerate
+
+
+def load_labels(path):
+    times = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if fields and not fields[0].startswith("#"):
+                times.append(float(fields[0]))
+    return sorted(times)
+
+
+def synthesize(duration=60.0, samplerate=44100, noise=0.005, seed=0):
+    """
+    a fake recording and its clap labels
+
+    every few seconds there's either a double clap, a single clap or a
+    distractor (a long thump or a burst of speech-like noise) that should
+    not count as a clap
+    """
+    rng = n.random.default_rng(seed)
+    samples = rng.normal(0, noise, int(duration * samplerate)).astype(n.float32)
+    hum = n.sin(2 * n.pi * 50 * n.arange(len(samples)) / samplerate) * noise
+    samples += hum.astype(n.float32)
+    labels = []
+
+    def add(start, sound):
+        i = int(start * samplerate)
+        end = min(i + len(sound), len(samples))
+        samples[i:end] += sound[:end - i]
+
+    def clap():
+        t = n.arange(int(0.05 * samplerate))
+        decay = rng.uniform(0.003, 0.008) * samplerate
+        return (rng.normal(0, rng.uniform(0.2, 0.7), len(t)) * n.exp(-t / decay)).astype(n.float32)
+
+    t = 1.0
+    while t < duration - 3:
+        kind = rng.choice(["double", "single", "thump", "speech"], p=[0.5, 0.2, 0.15, 0.15])
+        if kind in ("double", "single"):
+            add(t, clap())
+            labels.append(t)
+            if kind == "double":
+                second = t + rng.uniform(0.2, 0.5)
+                add(second, clap())
+                labels.append(second)
+        elif kind == "thump":
+            length = rng.uniform(0.6, 1.2)
+            s = n.arange(int(length * samplerate)) / samplerate
+            add(t, (0.4 * n.sin(2 * n.pi * 80 * s) * n.exp(-s / length)).astype(n.float32))
+        else:
+            length = rng.uniform(0.8, 1.5)
+            s = n.arange(int(length * samplerate)) / samplerate
+            envelope = 0.15 * (1 + n.sin(2 * n.pi * 4 * s)) / 2
+            add(t, (rng.normal(0, 1, len(s)) * envelope).astype(n.float32))
+        t += rng.uniform(2.0, 4.0)
+    return samples, samplerate, labels
+
+
+class _RecordingDetector(ClapDetector):
+    """ClapDetector that remembers each clap it accepts and when it knew about it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.claps = []
+        self.block_end = 0.0
+
+    def _transient_ended(self, now):
+        if now - self.trans_start <= self.max_duration:
+            self.claps.append((self.trans_start, self.block_end))
+        super()._transient_ended(now)
+
+
+def replay(samples, samplerate, params=None, blocksize=1024):
+    """run a recording through a detector; returns the accepted claps, triggers and timings"""
+    engine = CaptureEngine(samplerate=samplerate, blocksize=blocksize)
+    triggers = []
+    detector = _RecordingDetector(lambda: None, engine=engine, **(params or {}))
+    engine.subscribe(detector._on_block, start=False)
+
+    cpu, wall = [], []
+    dispatched = 0
+    last_trigger = detector.last_trigger
+    started = time.perf_counter()
+    for start in range(0, len(samples), blocksize):
+        block = samples[start:start + blocksize]
+        detector.block_end = (start + len(block)) / samplerate
+        engine.write(block, start / samplerate)
+        c0, w0 = time.thread_time(), time.perf_counter()
+        dispatched = engine.dispatch(dispatched)
+        cpu.append(time.thread_time() - c0)
+        wall.append(time.perf_counter() - w0)
+        if detector.last_trigger != last_trigger:
+            last_trigger = detector.last_trigger
+            triggers.append(detector.block_end)
+    elapsed = time.perf_counter() - started
+    return {"claps": detector.claps, "triggers": triggers, "cpu": cpu, "wall": wall, "elapsed": elapsed,
+            "duration": len(samples) / samplerate, "budget": blocksize / samplerate}
+
+
+def score(claps, labels, tolerance=0.05):
+    """match detected clap starts to labels within tolerance seconds"""
+    matched, latencies = 0, []
+    i = 0
+    for label in labels:
+        while i < len(claps) and claps[i][0] < label - tolerance:
+            i += 1
+        if i < len(claps) and claps[i][0] <= label + tolerance:
+            matched += 1
+            latencies.append(claps[i][1] - label)
+            i += 1
+    # a detector that never fires gets no credit for never being wrong
+    precision = matched / len(claps) if claps else 0.0
+    recall = matched / len(labels) if labels else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1, "matched": matched, "latencies": latencies}
+
+
+def _percentile(values, p):
+    if not values:
+        return float("nan")
+    return float(n.percentile(values, p))
+
+
+def report(name, result, labels, tolerance):
+    scored = score(result["claps"], labels, tolerance)
+    latencies = scored["latencies"]
+    print(f"{name}: {result['duration']:.1f}s of audio in {result['elapsed']:.2f}s "
+          f"({result['duration'] / result['elapsed']:.0f}x real time)")
+    print(f"  claps      labelled {len(labels)}, detected {len(result['claps'])}, matched {scored['matched']}")
+    print(f"  precision  {scored['precision']:.3f}   recall {scored['recall']:.3f}   f1 {scored['f1']:.3f}")
+    print(f"  triggers   {len(result['triggers'])} double claps")
+    if latencies:
+        print(f"  latency    median {statistics.median(latencies) * 1000:.1f}ms   "
+              f"p95 {_percentile(latencies, 95) * 1000:.1f}ms   max {max(latencies) * 1000:.1f}ms "
+              f"(clap to end of the block it was detected in)")
+    cpu = result["cpu"]
+    print(f"  cpu/block  mean {statistics.fmean(cpu) * 1e6:.0f}us   p99 {_percentile(cpu, 99) * 1e6:.0f}us   "
+          f"max {max(result['wall']) * 1e6:.0f}us wall, budget {result['budget'] * 1e6:.0f}us")
+
+
+def _inputs(args):
+    """[(name, samples, samplerate, labels)] from --wav/--labels or --synthetic"""
+    inputs = []
+    for path in args.wav or []:
+        samples, samplerate = load_wav(path)
+        labels_path = args.labels or os.path.splitext(path)[0] + ".txt"
+        labels = load_labels(labels_path) if os.path.exists(labels_path) else []
+        inputs.append((os.path.basename(path), samples, samplerate, labels))
+    if args.synthetic or not inputs:
+        for seed in range(args.seeds):
+            samples, samplerate, labels = synthesize(args.duration, noise=args.noise, seed=seed)
+            inputs.append((f"synthetic seed={seed}", samples, samplerate, labels))
+    return inputs
+
+
+def _params(args):
+    return {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+
+
+def run(args):
+    for name, samples, samplerate, labels in _inputs(args):
+        result = replay(samples, samplerate, _params(args), args.blocksize)
+        report(name, result, labels, args.tolerance)
+
+
+_sweep_inputs = None
+
+
+def _init_sweep(inputs):
+    global _sweep_inputs
+    _sweep_inputs = inputs
+
+
+def _sweep_one(job):
+    params, blocksize, tolerance = job
+    matched = claps = labelled = triggers = 0
+    cpu = []
+    for _, samples, samplerate, labels in _sweep_inputs:
+        result = replay(samples, samplerate, params, blocksize)
+        scored = score(result["claps"], labels, tolerance)
+        matched += scored["matched"]
+        claps += len(result["claps"])
+        labelled += len(labels)
+        triggers += len(result["triggers"])
+        cpu.extend(result["cpu"])
+    precision = matched / claps if claps else 0.0
+    recall = matched / labelled if labelled else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return params, precision, recall, f1, triggers, statistics.fmean(cpu)
+
+
+def sweep(args):
+    grid = {}
+    for name in PARAMETERS:
+        value = getattr(args, name)
+        if value is not None:
+            grid[name] = [float(v) for v in value.split(",")]
+    if not grid:
+        sys.exit("give at least one comma-separated list, e.g. --threshold 0.03,0.06,0.1")
+    names = list(grid)
+    jobs = [(dict(zip(names, values)), args.blocksize, args.tolerance)
+            for values in itertools.product(*(grid[name] for name in names))]
+    inputs = _inputs(args)
+
+    processes = args.processes or os.cpu_count()
+    print(f"{len(jobs)} configurations x {len(inputs)} recordings on {processes} processes")
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes, initializer=_init_sweep, initargs=(inputs,)) as pool:
+        results = pool.map(_sweep_one, jobs)
+    results.sort(key=lambda r: r[3], reverse=True)
+
+    header = "  ".join(f"{name:>12}" for name in names)
+    print(f"{header}  {'precision':>9}  {'recall':>6}  {'f1':>5}  {'triggers':>8}  {'cpu/block':>9}")
+    for params, precision, recall, f1, triggers, cpu in results[:args.top]:
+        values = "  ".join(f"{params[name]:12g}" for name in names)
+        print(f"{values}  {precision:9.3f}  {recall:6.3f}  {f1:5.3f}  {triggers:8d}  {cpu * 1e6:7.0f}us")
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command, value_type in (("run", float), ("sweep", str)):
+        sub = commands.add_parser(command)
+        sub.add_argument("--wav", action="append", help="recording to replay (repeatable)")
+        sub.add_argument("--labels", help="clap times for --wav, one per line")
+        sub.add_argument("--synthetic", action="store_true", help="replay synthetic recordings")
+        sub.add_argument("--seeds", type=int, default=1, help="number of synthetic recordings")
+        sub.add_argument("--duration", type=float, default=60.0, help="length of each synthetic recording (s)")
+        sub.add_argument("--noise", type=float, default=0.005, help="background noise level of synthetic recordings")
+        sub.add_argument("--blocksize", type=int, default=1024)
+        sub.add_argument("--tolerance", type=float, default=0.05, help="max distance from a label to count as a hit (s)")
+        for name in PARAMETERS:
+            sub.add_argument("--" + name.replace("_", "-"), dest=name, type=value_type,
+                             help="comma-separated values to try" if command == "sweep" else None)
+        if command == "sweep":
+            sub.add_argument("--processes", type=int, help="worker processes (default: all cores)")
+            sub.add_argument("--top", type=int, default=10, help="configurations to show")
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sweep(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,96 @@
-import os
 import importlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from plugins import PLUGINS
 
 class DeviceManager:
-    def __init__(self):
+    def __init__(self, plugins=None):
+        self.plugins = PLUGINS if plugins is None else plugins
         self.log = {}
+        self.registries = []
+        self._status_listeners = []
+        self._lock = threading.Lock()
 
     def load(self):
-        for folder in os.listdir("plugins"):
-            module_name = f"plugins.{folder}.{folder}_driver"
+        # every plugin discovers in its own thread; devices are added as each one reports
+        if not self.plugins:
+            return
+        pool = ThreadPoolExecutor(max_workers=len(self.plugins), thread_name_prefix="plugin")
+        start = time.monotonic()
+        futures = {name: pool.submit(self._load_plugin, name, module_name, class_name)
+                   for name, (module_name, class_name, _) in self.plugins.items()}
+        # don't let a stuck plugin hold up shutdown of the others
+        pool.shutdown(wait=False)
+
+        for name, future in futures.items():
+            timeout = self.plugins[name][2]
+            try:
+                future.result(timeout=max(0, start + timeout - time.monotonic()))
+            except TimeoutError:
+                logging.warning(f"[DeviceManager] {name} still discovering after {timeout}s; "
+                                "its devices will appear when it finishes")
+            except Exception as e:
+                logging.error(f"[DeviceManager] Failed to load plugin {name}: {e}")
+
+    def _load_plugin(self, name, module_name, class_name):
+        module = importlib.import_module(module_name)
+        cls = getattr(module, class_name)
+        registry = cls.registry()
+        if registry is not None:
+            with self._lock:
+                # listeners first, so the statuses of the first casts found aren't missed
+                if hasattr(registry, "add_status_listener"):
+                    for callback in self._status_listeners:
+                        registry.add_status_listener(callback)
+                self.registries.append(registry)
+            registry.start()
+            return
+        devices = cls.discover()
+        with self._lock:
+            for device in devices:
+                self.log[device.name] = device
+        logging.info(f"[DeviceManager] {name}: {len(devices)} device(s)")
+
+    def devices(self):
+        with self._lock:
+            devices = dict(self.log)
+            registries = list(self.registries)
+        for registry in registries:
+            for device in registry.devices():
+                devices[device.name] = device
+        return devices
+
+    def add_status_listener(self, callback):
+        """call callback(device, status) when a device's status changes, for registries that push it"""
+        with self._lock:
+            self._status_listeners.append(callback)
+            registries = list(self.registries)
+        for registry in registries:
+            if hasattr(registry, "add_status_listener"):
+                registry.add_status_listener(callback)
+
+    def statuses(self):
+        """every device's current status by name"""
+        statuses = {}
+        for name, device in self.devices().items():
             try:
-                module = importlib.import_module(module_name)
-                cls = getattr(module, f"{folder.capitalize()}Device")
-                for device in cls.discover():
-                    self.log[device.name] = device
-            except (ModuleNotFoundError, AttributeError):
-                continue
+                statuses[name] = device.get_status()
+            except Exception as e:
+                statuses[name] = {"error": str(e)}
+        return statuses
 
     def list_devices(self):
-        return list(self.log.keys())
+        return list(self.devices().keys())
 
     def get_device(self, name):
-        return self.log.get(name)
+        return self.devices().get(name)
 
     def toggle_device(self):
-        if not self.log:
+        devices = self.devices()
+        if not devices:
             return
-        device = next(iter(self.log.values()))
+        device = next(iter(devices.values()))
         device.toggle()
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# type is the SSE event name; None for plain messages
+Event = namedtuple("Event", ["id", "topic", "data", "type"], defaults=(None,))
+
+
+class Subscription:
+    """one subscriber's view of the hub: a bounded ring buffer of matching events"""
+
+    def __init__(self, hub, topics, maxlen):
+        self.hub = hub
+        self.topics = set(topics) if topics is not None else None
+        self.dropped = 0
+        self._buffer = deque(maxlen=maxlen)
+        self._ready = threading.Condition(threading.Lock())
+
+    def matches(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def push(self, event):
+        # never blocks the publisher; a full buffer forgets its oldest event
+        with self._ready:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """wait up to timeout seconds and return every buffered event (possibly none)"""
+        with self._ready:
+            if not self._buffer:
+                self._ready.wait(timeout)
+            events = list(self._buffer)
+            self._buffer.clear()
+        return events
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    broadcast pub/sub: every subscriber gets every event on its topics
+
+    events get increasing ids (seeded from the clock so they keep increasing
+    across restarts) and the last `history` events are kept so a reconnecting
+    client can ask for everything after the last id it saw
+    """
+
+    def __init__(self, history=256, buffer_size=64):
+        self.buffer_size = buffer_size
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last_id = int(time.time() * 1000)
+
+    def publish(self, topic, data, type=None):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, topic, data, type)
+            self._history.append(event)
+            # pushing under the lock keeps every subscriber's events in id order
+            for subscriber in self._subscribers:
+                if subscriber.matches(topic):
+                    subscriber.push(event)
+        return event
+
+    def subscribe(self, topics=None, last_event_id=None, factory=Subscription):
+        """subscribe to topics (None for all), replaying retained events newer than last_event_id"""
+        subscriber = factory(self, topics, self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event.id > last_event_id and subscriber.matches(event.topic):
+                        subscriber.push(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def last_id(self):
+        """id of the newest event, so a snapshot can be followed by a stream with no gap"""
+        with self._lock:
+            return self._last_id
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_event(event):
+    """an event as an SSE frame"""
+    kind = f"event: {event.type}\n" if event.type else ""
+    return f"id: {event.id}\n{kind}data: {event.data}\n\n"
+
+
+def parse_event_id(value):
+    """Last-Event-ID header/param as an int, or None if missing or malformed"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,191 @@
+import asyncio
+import functools
+import logging
+import re
+import threading
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from core.event_hub import Subscription, format_event, parse_event_id
+
+# one device's events, or every device's
+EVENTS_PATH = re.compile(r"^/device/([^/]+)/events$")
+ALL_EVENTS_PATH = "/devices/events"
+
+# a client that lets this much pile up unread is dropped rather than buffered forever
+MAX_WRITE_BUFFER = 256 * 1024
+
+
+class AsyncSubscription(Subscription):
+    """subscription that also wakes a coroutine on the event loop"""
+
+    def __init__(self, hub, topics, maxlen, loop):
+        super().__init__(hub, topics, maxlen)
+        self.loop = loop
+        self.ready = asyncio.Event()
+
+    def push(self, event):
+        super().push(event)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+class _Connection:
+    __slots__ = ("writer", "last_write")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.last_write = time.monotonic()
+
+    def send(self, data):
+        self.writer.write(data)
+        self.last_write = time.monotonic()
+
+
+class EventServer:
+    """
+    serves /device/<name>/events and /devices/events as SSE from a single asyncio loop
+
+    runs on its own port in a background thread, so an open dashboard tab
+    costs a coroutine and a socket instead of a Flask worker thread. one
+    heartbeat task pings every idle connection together instead of a timer
+    per connection
+    """
+
+    def __init__(self, hub, host="0.0.0.0", port=5001, heartbeat=15, allow_origin="*"):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.allow_origin = allow_origin
+        self.loop = None
+        self._server = None
+        self._connections = set()
+        self._thread = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="event-server", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    @property
+    def connection_count(self):
+        return len(self._connections)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=1024))
+            self.port = self._server.sockets[0].getsockname()[1]
+            logging.info(f"[EventServer] Listening on {self.host}:{self.port}")
+        except OSError as e:
+            logging.error(f"[EventServer] Could not listen on {self.host}:{self.port}: {e}")
+            self._started.set()
+            return
+        self.loop.create_task(self._heartbeats())
+        self._started.set()
+        self.loop.run_forever()
+
+    async def _heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            cutoff = time.monotonic() - self.heartbeat
+            for connection in list(self._connections):
+                if connection.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                    connection.writer.close()
+                elif connection.last_write <= cutoff:
+                    connection.send(b": ping\n\n")
+
+    def _headers(self, status, extra=()):
+        lines = [f"HTTP/1.1 {status}",
+                 f"Access-Control-Allow-Origin: {self.allow_origin}",
+                 "Access-Control-Allow-Headers: Last-Event-ID, Cache-Control",
+                 *extra, "", ""]
+        return "\r\n".join(lines).encode()
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        match = EVENTS_PATH.match(url.path)
+        if method == "OPTIONS":
+            writer.write(self._headers("204 No Content", ["Access-Control-Allow-Methods: GET, OPTIONS",
+                                                          "Content-Length: 0", "Connection: close"]))
+            await self._close(writer)
+            return
+        if method != "GET" or (match is None and url.path != ALL_EVENTS_PATH):
+            writer.write(self._headers("404 Not Found", ["Content-Length: 0", "Connection: close"]))
+            await self._close(writer)
+            return
+
+        topics = {unquote(match.group(1))} if match else None
+        last_event_id = parse_event_id(headers.get("last-event-id") or
+                                       parse_qs(url.query).get("last_event_id", [None])[0])
+        await self._stream(reader, writer, topics, last_event_id)
+
+    async def _stream(self, reader, writer, topics, last_event_id):
+        factory = functools.partial(AsyncSubscription, loop=self.loop)
+        subscription = self.hub.subscribe(topics=topics, last_event_id=last_event_id, factory=factory)
+        connection = _Connection(writer)
+        self._connections.add(connection)
+        # the client never sends anything after its request, so a read only returns on disconnect
+        closed = asyncio.ensure_future(reader.read(1))
+        try:
+            connection.send(self._headers("200 OK", ["Content-Type: text/event-stream",
+                                                     "Cache-Control: no-cache", "Connection: close"]))
+            connection.send(b"retry: 1000\n\n: connected\n\n")
+            while not closed.done():
+                ready = asyncio.ensure_future(subscription.ready.wait())
+                await asyncio.wait({ready, closed}, return_when=asyncio.FIRST_COMPLETED)
+                ready.cancel()
+                subscription.ready.clear()
+                for event in subscription.get(timeout=0):
+                    connection.send(format_event(event).encode())
+                if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            closed.cancel()
+            subscription.close()
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _close(self, writer):
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
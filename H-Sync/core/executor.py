@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+class ExecutorFull(Exception):
+    """a device already has max_pending commands waiting"""
+
+
+class Job:
+    """one device command: queued -> running -> done/failed, or expired if it waited too long"""
+
+    def __init__(self, device, action, fn, args, timeout):
+        self.id = uuid.uuid4().hex[:16]
+        self.device = device
+        self.action = action
+        self.fn = fn
+        self.args = args
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.coalesced = 0
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + timeout
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """wait until the job finishes, by default until its deadline; True if it did"""
+        if timeout is None:
+            timeout = max(0, self.deadline - time.monotonic())
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "device": self.device,
+            "action": self.action,
+            "state": self.state,
+            "error": self.error,
+            "coalesced": self.coalesced,
+            "queued_ms": round(((self.started or time.monotonic()) - self.submitted) * 1000),
+            "run_ms": round((self.finished - self.started) * 1000) if self.finished and self.started else None,
+        }
+
+
+class ActionExecutor:
+    """
+    runs device commands on a fixed pool of worker threads
+
+    each device has its own FIFO lane and at most one of its commands runs at
+    a time, so commands reach a cast in the order they were sent while
+    different devices run in parallel. a command identical to one still
+    waiting in its lane is merged into it instead of queued twice, and a
+    command still waiting at its deadline is dropped rather than sent late.
+    blocking calls can't be interrupted, so a command already running past
+    its deadline only stops waiters from waiting on it
+    """
+
+    def __init__(self, workers=4, timeout=15.0, max_pending=16, history=256):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.history = history
+        self._lanes = {}
+        self._scheduled = set()
+        self._jobs = OrderedDict()
+        self._ready = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, device, action, fn, *args, coalesce=True, timeout=None):
+        """queue fn(*args) on device's lane and return its Job straight away"""
+        with self._lock:
+            lane = self._lanes.setdefault(device, deque())
+            if coalesce:
+                for job in lane:
+                    if job.action == action and job.args == args:
+                        job.coalesced += 1
+                        return job
+            if len(lane) >= self.max_pending:
+                raise ExecutorFull(f"{device} already has {len(lane)} commands waiting")
+
+            job = Job(device, action, fn, args, self.timeout if timeout is None else timeout)
+            lane.append(job)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+
+            if device not in self._scheduled:
+                self._scheduled.add(device)
+                self._ready.put(device)
+            if not self._threads:
+                self._start_workers()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self, device):
+        with self._lock:
+            return len(self._lanes.get(device, ()))
+
+    def _start_workers(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"device-action-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            device = self._ready.get()
+            with self._lock:
+                job = self._lanes[device].popleft()
+            self._run(job)
+            with self._lock:
+                if self._lanes[device]:
+                    # back of the line, so one busy device can't hog a worker
+                    self._ready.put(device)
+                else:
+                    del self._lanes[device]
+                    self._scheduled.discard(device)
+
+    def _run(self, job):
+        if time.monotonic() > job.deadline:
+            job.state = "expired"
+            logging.warning(f"[ActionExecutor] Dropped {job.action} for {job.device}: waited past its deadline")
+            job._done.set()
+            return
+
+        job.state = "running"
+        job.started = time.monotonic()
+        try:
+            job.result = job.fn(*job.args)
+            job.state = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.state = "failed"
+            logging.error(f"[ActionExecutor] {job.action} failed for {job.device}: {e}")
+        job.finished = time.monotonic()
+        if job.finished > job.deadline:
+            logging.warning(f"[ActionExecutor] {job.action} for {job.device} took "
+                            f"{job.finished - job.started:.1f}s, past its deadline")
+        job._done.set()
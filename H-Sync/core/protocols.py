@@ -7,6 +7,14 @@ class Device(ABC):
     def discover(cls):
         """used to discover devices"""
 
+    @classmethod
+    def registry(cls):
+        """
+        live registry with start() and devices(), or None to use discover() once.
+        a registry may also have add_status_listener(callback) to push status changes
+        """
+        return None
+
     @abstractmethod
     def turn_on(self):
         """to turn the device on"""
@@ -0,0 +1,5 @@
+# plugins loaded by DeviceManager
+# name -> (driver module, device class, discovery timeout in seconds)
+PLUGINS = {
+    "chromecast": ("plugins.chromecast.chromecast_driver", "ChromecastDevice", 15),
+}
@@ -1,31 +1,69 @@
 import pychromecast
 from core.protocols import Device
 import re
+import threading
 import yt_dlp
+import zeroconf
+from pychromecast.controllers.media import MediaStatusListener
+from pychromecast.controllers.receiver import CastStatusListener
 from pychromecast.controllers.youtube import YouTubeController
+from pychromecast.discovery import CastBrowser, SimpleCastListener
+from pychromecast.socket_client import ConnectionStatusListener
 import logging
 
+CONNECT_TIMEOUT = 10
+
+class _StatusListener(CastStatusListener, MediaStatusListener, ConnectionStatusListener):
+    # pychromecast calls these from the cast's socket thread
+    def __init__(self, device):
+        self.device = device
+
+    def new_cast_status(self, status):
+        self.device._status_changed("_cast_status", status)
+
+    def new_media_status(self, status):
+        self.device._status_changed("_media_status", status)
+
+    def load_media_failed(self, queue_item_id, error_code):
+        logging.warning(f"[ChromecastDevice] {self.device.name} failed to load media (error {error_code})")
+
+    def new_connection_status(self, status):
+        self.device._status_changed("_connection", status.status)
+
+
 class ChromecastDevice(Device):
-    def __init__(self, chromecast):
+    def __init__(self, chromecast, on_status=None):
         self.name = chromecast.name
         self._casts = chromecast
+        # called as on_status(device, status) whenever the snapshot changes
+        self._on_status = on_status
+        self._status_lock = threading.Lock()
+        self._cast_status = chromecast.status
+        self._media_status = None
+        self._connection = None
+        self._status = self._snapshot()
+
+        listener = _StatusListener(self)
+        chromecast.register_status_listener(listener)
+        chromecast.media_controller.register_status_listener(listener)
+        chromecast.register_connection_listener(listener)
 
     @classmethod
-    def discover(cls):
-        
-        chromecasts, browser = pychromecast.get_chromecasts(timeout=15)
-
-        devices = []
-        for cast in chromecasts:
-            cast.wait() 
-            devices.append(cls(cast))
+    def registry(cls):
+        return _registry
 
-        return devices
+    @classmethod
+    def discover(cls):
+        # devices seen so far by the background browser; never blocks
+        _registry.start()
+        return _registry.devices()
         
 
     def _ensure_connected(self):
         if self._casts is None:
             raise RuntimeError("Chromecast is not connected or initialized.")
+        # returns straight away once the cast has connected and sent its status
+        self._casts.wait(timeout=CONNECT_TIMEOUT)
         
 
     def turn_on(self):
@@ -155,25 +193,148 @@ class ChromecastDevice(Device):
 
 
     def get_status(self):
-        self._ensure_connected()
-        status = self._casts.status  
-
-        # 1) Try old-style player_state
-        ps = getattr(status, "player_state", None)
-        if ps is not None:
-            is_active = ps not in ("IDLE", "UNKNOWN")
-
+        # kept current by the cast's status listeners, so this never touches the network
+        with self._status_lock:
+            return dict(self._status)
+
+
+    def _status_changed(self, attr, value):
+        with self._status_lock:
+            setattr(self, attr, value)
+            status = self._snapshot()
+            if status == self._status:
+                return
+            self._status = status
+        if self._on_status is not None:
+            self._on_status(self, dict(status))
+
+
+    def _snapshot(self):
+        cast, media = self._cast_status, self._media_status
+
+        if cast is None:
+            is_active = False
+        elif cast.is_active_input is not None:
+            # the TV reports (over CEC) whether it's on and showing this input
+            is_active = bool(cast.is_active_input) and not cast.is_stand_by
         else:
-            # 2) Try newer transport_state
-            ts = getattr(status, "transport_state", None)
-            if ts is not None:
-                is_active = ts not in ("IDLE", "UNKNOWN")
-            else:
-                # 3) Ultimate fallback: if there's any display_name, assume active
-                is_active = bool((getattr(status, "display_name", "") or "").strip())
+            is_active = cast.app_id not in (None, pychromecast.IDLE_APP_ID)
 
         return {
-            
-            "volume":    getattr(status, "volume_level", None),
+            "connected": self._connection == "CONNECTED",
+            "is_active": is_active,
+            "app":       cast.display_name if cast else None,
+            "volume":    cast.volume_level if cast else None,
+            "muted":     cast.volume_muted if cast else None,
+            "player_state": media.player_state if media else None,
+            "title":     media.title if media else None,
         }
-        
\ No newline at end of file
+
+
+
+class CastRegistry:
+    """
+    Live map of the Chromecasts on the network.
+
+    One CastBrowser keeps running for the life of the app; its zeroconf
+    callbacks add, rename and drop devices as they come and go, so reads
+    never wait on discovery.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._status_listeners = []
+        self._zconf = None
+        self._browser = None
+
+    def start(self):
+        with self._lock:
+            if self._browser is not None:
+                return
+            self._zconf = zeroconf.Zeroconf()
+            listener = SimpleCastListener(self._add_cast, self._remove_cast, self._update_cast)
+            self._browser = CastBrowser(listener, self._zconf)
+        self._browser.start_discovery()
+
+    def stop(self):
+        with self._lock:
+            browser, zconf = self._browser, self._zconf
+            devices = list(self._devices.values())
+            self._browser = self._zconf = None
+            self._devices.clear()
+        if browser is None:
+            return
+        browser.stop_discovery()
+        for device in devices:
+            _disconnect(device)
+        zconf.close()
+
+    def devices(self):
+        with self._lock:
+            return list(self._devices.values())
+
+    def add_status_listener(self, callback):
+        """call callback(device, status) whenever any cast's status changes"""
+        with self._lock:
+            self._status_listeners = self._status_listeners + [callback]
+
+    def _status_changed(self, device, status):
+        for callback in self._status_listeners:
+            try:
+                callback(device, status)
+            except Exception as e:
+                logging.error(f"[CastRegistry] Status listener error: {e}")
+
+    def get(self, name):
+        with self._lock:
+            for device in self._devices.values():
+                if device.name == name:
+                    return device
+        return None
+
+    def _add_cast(self, uuid, service):
+        cast_info = self._browser.services.get(uuid)
+        if cast_info is None:
+            return
+        cast = pychromecast.get_chromecast_from_cast_info(cast_info, self._zconf)
+        # listeners go on before the connection starts so no status update is missed
+        device = ChromecastDevice(cast, on_status=self._status_changed)
+        # connects in the cast's own thread; nothing here waits on the network
+        cast.start()
+        with self._lock:
+            old = self._devices.get(uuid)
+            self._devices[uuid] = device
+        if old is not None:
+            _disconnect(old)
+        logging.info(f"[CastRegistry] Added {cast_info.friendly_name}")
+
+    def _update_cast(self, uuid, service):
+        cast_info = self._browser.services.get(uuid)
+        with self._lock:
+            device = self._devices.get(uuid)
+            if device is None or cast_info is None:
+                return
+            # host/port changes are picked up by the cast's socket client on reconnect
+            device.name = cast_info.friendly_name
+
+    def _remove_cast(self, uuid, service, cast_info):
+        with self._lock:
+            device = self._devices.pop(uuid, None)
+        if device is not None:
+            _disconnect(device)
+            logging.info(f"[CastRegistry] Removed {device.name}")
+
+
+def _disconnect(device):
+    # join() can take a while; don't hold up the zeroconf thread for it
+    def close():
+        try:
+            device._casts.disconnect(timeout=CONNECT_TIMEOUT)
+        except Exception as e:
+            logging.warning(f"[CastRegistry] Error disconnecting {device.name}: {e}")
+
+    threading.Thread(target=close, daemon=True).start()
+
+
+_registry = CastRegistry()
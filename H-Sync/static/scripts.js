@@ -166,12 +166,26 @@ document.addEventListener('DOMContentLoaded', () => {
   
 });
 
+let lastEventId = null;
+
 function initSSE() {
   console.log("DOM ready, opening SSE", deviceName);
-  const es = new EventSource(`/device/${encodeURIComponent(deviceName)}/events`);
+  // a new EventSource doesn't resend Last-Event-ID, so pass it along to replay missed claps
+  const since = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : "";
+  // events come from the asyncio event server on its own port when it's enabled
+  const base = eventsPort ? `${location.protocol}//${location.hostname}:${eventsPort}` : "";
+  const es = new EventSource(`${base}/device/${encodeURIComponent(deviceName)}/events${since}`);
 
   es.onopen    = () => console.log("SSE connection open");
-  es.onmessage = e => showPopup(`Double‑clap detected on ${e.data}!`, 2500);
+  es.onmessage = e => {
+    if (e.lastEventId) lastEventId = e.lastEventId;
+    showPopup(`Double‑clap detected on ${e.data}!`, 2500);
+  };
+  // status changes are pushed as they happen, so nothing here polls
+  es.addEventListener("status", e => {
+    if (e.lastEventId) lastEventId = e.lastEventId;
+    updateStatus(JSON.parse(e.data).status);
+  });
   es.onerror   = err => {
     console.error("SSE error, reconnecting in 3s", err);
     es.close();
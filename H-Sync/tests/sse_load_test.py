@@ -0,0 +1,120 @@
+"""
+Load test for the asyncio SSE event server.
+
+Starts an EventServer in a child process, opens thousands of idle
+EventSource-style connections to it, and reports the server's resident
+memory per connection. Then publishes one event and checks that every
+connection receives it.
+
+    python tests/sse_load_test.py --connections 5000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import selectors
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def serve(port_queue, publish_queue, heartbeat):
+    raise_fd_limit()
+    from core.event_hub import EventHub
+    from core.event_server import EventServer
+
+    hub = EventHub()
+    server = EventServer(hub, host="127.0.0.1", port=0, heartbeat=heartbeat)
+    server.start()
+    port_queue.put(server.port)
+    while True:
+        topic = publish_queue.get()
+        if topic is None:
+            break
+        hub.publish(topic, topic)
+        port_queue.put(server.connection_count)
+
+
+def read_all(sockets, marker, timeout):
+    """wait until every socket has received marker; return how many did"""
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for sock in sockets:
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b""
+    pending = set(sockets)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            sock = key.fileobj
+            data = sock.recv(65536)
+            buffers[sock] += data
+            if marker in buffers[sock] or not data:
+                pending.discard(sock)
+                selector.unregister(sock)
+    selector.close()
+    return sum(marker in data for data in buffers.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--heartbeat", type=float, default=15)
+    args = parser.parse_args()
+
+    limit = raise_fd_limit()
+    if args.connections + 100 > limit:
+        parser.error(f"open file limit is {limit}; use fewer connections")
+
+    ports, publish = multiprocessing.Queue(), multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(ports, publish, args.heartbeat), daemon=True)
+    server.start()
+    port = ports.get(timeout=10)
+    time.sleep(0.5)
+    before = rss_kb(server.pid)
+
+    start = time.monotonic()
+    sockets = []
+    for i in range(args.connections):
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(b"GET /device/bench/events HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+        sockets.append(sock)
+    connected = read_all(sockets, b": connected", timeout=30)
+    elapsed = time.monotonic() - start
+    time.sleep(0.5)
+    after = rss_kb(server.pid)
+
+    publish.put("bench")
+    open_connections = ports.get(timeout=10)
+    delivered = read_all(sockets, b"data: bench", timeout=30)
+
+    print(f"connections opened  {connected}/{args.connections} in {elapsed:.1f}s")
+    print(f"server connections  {open_connections}")
+    print(f"server RSS          {before / 1024:.1f} MB -> {after / 1024:.1f} MB")
+    print(f"memory/connection   {(after - before) / max(connected, 1):.1f} KB")
+    print(f"event delivered to  {delivered}/{connected}")
+
+    for sock in sockets:
+        sock.close()
+    publish.put(None)
+    server.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
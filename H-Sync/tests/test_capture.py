@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import audio.capture as capture
+from audio.capture import CaptureEngine
+
+
+class FakeStream:
+    opened = []
+
+    def __init__(self, **kwargs):
+        self.closed = False
+        FakeStream.opened.append(self)
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class BrokenStream:
+    def __init__(self, **kwargs):
+        raise OSError("no input device")
+
+
+@pytest.fixture
+def fake_sounddevice(monkeypatch):
+    FakeStream.opened = []
+    monkeypatch.setattr(capture, "HAS_SOUNDDEVICE", True)
+    monkeypatch.setattr(capture, "sd", types.SimpleNamespace(InputStream=FakeStream), raising=False)
+    return FakeStream
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def listener(samples, adc_time):
+    pass
+
+
+def test_stream_closes_after_last_subscriber_leaves(fake_sounddevice):
+    engine = CaptureEngine(idle_timeout=0.05)
+    engine.subscribe(listener)
+    stream = fake_sounddevice.opened[0]
+    engine.unsubscribe(listener)
+
+    wait_for(lambda: stream.closed)
+    assert engine._stream is None
+
+
+def test_resubscribing_within_grace_period_keeps_the_stream(fake_sounddevice):
+    engine = CaptureEngine(idle_timeout=0.1)
+    other = lambda samples, adc_time: None
+    engine.subscribe(listener)
+    engine.unsubscribe(listener)
+    engine.subscribe(other)
+    time.sleep(0.2)
+
+    assert len(fake_sounddevice.opened) == 1
+    assert not fake_sounddevice.opened[0].closed
+    engine.stop()
+    assert fake_sounddevice.opened[0].closed
+
+
+def test_subscribing_after_close_reopens(fake_sounddevice):
+    engine = CaptureEngine(idle_timeout=0)
+    engine.subscribe(listener)
+    engine.unsubscribe(listener)
+    wait_for(lambda: fake_sounddevice.opened[0].closed)
+
+    engine.subscribe(listener)
+    assert len(fake_sounddevice.opened) == 2
+    engine.stop()
+
+
+def test_failed_open_rolls_back_the_subscriber(monkeypatch):
+    monkeypatch.setattr(capture, "HAS_SOUNDDEVICE", True)
+    monkeypatch.setattr(capture, "sd", types.SimpleNamespace(InputStream=BrokenStream), raising=False)
+    engine = CaptureEngine()
+
+    with pytest.raises(OSError):
+        engine.subscribe(listener)
+    assert engine.subscriber_count == 0
+    assert engine._stream is None
@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.event_hub import EventHub, format_event, parse_event_id
+
+
+def test_replays_retained_events_after_last_id():
+    hub = EventHub(history=10)
+    events = [hub.publish("lamp", f"on {i}") for i in range(5)]
+
+    subscription = hub.subscribe(last_event_id=events[1].id)
+    assert subscription.get(timeout=0) == events[2:]
+
+    later = hub.publish("lamp", "off")
+    assert subscription.get(timeout=0) == [later]
+
+
+def test_no_last_id_means_no_replay():
+    hub = EventHub()
+    hub.publish("lamp", "on")
+    subscription = hub.subscribe()
+    assert subscription.get(timeout=0) == []
+
+
+def test_replay_only_covers_subscribed_topics():
+    hub = EventHub()
+    start = hub.last_id
+    lamp = hub.publish("lamp", "on")
+    hub.publish("tv", "on")
+    lamp_off = hub.publish("lamp", "off")
+
+    subscription = hub.subscribe(topics=["lamp"], last_event_id=start)
+    assert subscription.get(timeout=0) == [lamp, lamp_off]
+
+
+def test_replay_is_limited_to_history():
+    hub = EventHub(history=3)
+    start = hub.last_id
+    events = [hub.publish("lamp", str(i)) for i in range(6)]
+
+    subscription = hub.subscribe(last_event_id=start)
+    assert subscription.get(timeout=0) == events[-3:]
+
+
+def test_ids_increase_and_last_id_follows():
+    hub = EventHub()
+    first = hub.publish("lamp", "on")
+    second = hub.publish("tv", "on")
+    assert second.id == first.id + 1
+    assert hub.last_id == second.id
+
+
+def test_full_buffer_drops_oldest():
+    hub = EventHub(buffer_size=3)
+    subscription = hub.subscribe()
+    events = [hub.publish("lamp", str(i)) for i in range(5)]
+
+    assert subscription.get(timeout=0) == events[-3:]
+    assert subscription.dropped == 2
+
+
+def test_closed_subscription_stops_receiving():
+    hub = EventHub()
+    subscription = hub.subscribe()
+    subscription.close()
+    hub.publish("lamp", "on")
+
+    assert hub.subscriber_count == 0
+    assert subscription.get(timeout=0) == []
+
+
+def test_format_and_parse_event_id():
+    hub = EventHub()
+    event = hub.publish("lamp", '{"state": "on"}', type="status")
+    assert format_event(event) == f'id: {event.id}\nevent: status\ndata: {{"state": "on"}}\n\n'
+    assert parse_event_id(str(event.id)) == event.id
+    assert parse_event_id("abc") is None
+    assert parse_event_id(None) is None
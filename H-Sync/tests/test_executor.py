@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from core.executor import ActionExecutor, ExecutorFull
+
+
+def test_device_commands_run_in_submission_order():
+    executor = ActionExecutor(workers=4, max_pending=64)
+    ran = []
+    jobs = [executor.submit("lamp", f"step{i}", ran.append, i, coalesce=False) for i in range(50)]
+
+    assert all(job.wait(5) for job in jobs)
+    assert ran == list(range(50))
+    assert all(job.state == "done" for job in jobs)
+
+
+def test_one_command_per_device_at_a_time():
+    executor = ActionExecutor(workers=4)
+    running = {"lamp": 0, "tv": 0}
+    overlap = []
+    lock = threading.Lock()
+
+    def command(device):
+        with lock:
+            running[device] += 1
+            overlap.append(running[device])
+        time.sleep(0.01)
+        with lock:
+            running[device] -= 1
+
+    jobs = [executor.submit(device, f"cmd{i}", command, device, coalesce=False)
+            for i in range(10) for device in ("lamp", "tv")]
+
+    assert all(job.wait(5) for job in jobs)
+    assert max(overlap) == 1
+
+
+def test_identical_waiting_command_is_coalesced():
+    executor = ActionExecutor(workers=1)
+    release = threading.Event()
+    toggles = []
+
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    blocker = executor.submit("lamp", "slow", slow)
+    assert started.wait(5)
+    first = executor.submit("lamp", "toggle", toggles.append, "toggle")
+    second = executor.submit("lamp", "toggle", toggles.append, "toggle")
+    other = executor.submit("lamp", "set_volume", toggles.append, 0.5)
+
+    assert second is first
+    assert first.coalesced == 1
+    assert executor.pending("lamp") == 2
+    release.set()
+
+    assert blocker.wait(5) and first.wait(5) and other.wait(5)
+    assert toggles == ["toggle", 0.5]
+
+
+def test_coalesce_false_queues_every_command():
+    executor = ActionExecutor(workers=1)
+    release = threading.Event()
+    toggles = []
+
+    executor.submit("lamp", "slow", release.wait, 5)
+    first = executor.submit("lamp", "toggle", toggles.append, "toggle", coalesce=False)
+    second = executor.submit("lamp", "toggle", toggles.append, "toggle", coalesce=False)
+    release.set()
+
+    assert first is not second
+    assert first.wait(5) and second.wait(5)
+    assert toggles == ["toggle", "toggle"]
+
+
+def test_command_waiting_past_its_deadline_expires():
+    executor = ActionExecutor(workers=1)
+    release = threading.Event()
+    ran = []
+
+    blocker = executor.submit("lamp", "slow", release.wait, 5)
+    late = executor.submit("lamp", "turn_on", ran.append, "on", timeout=0.05)
+    time.sleep(0.1)
+    release.set()
+
+    assert blocker.wait(5)
+    assert late.wait(5)
+    assert late.state == "expired"
+    assert ran == []
+
+
+def test_failed_command_records_error_and_lane_continues():
+    executor = ActionExecutor(workers=1)
+    ran = []
+
+    def fail():
+        raise RuntimeError("cast offline")
+
+    failed = executor.submit("lamp", "turn_on", fail)
+    after = executor.submit("lamp", "turn_off", ran.append, "off")
+
+    assert failed.wait(5) and after.wait(5)
+    assert failed.state == "failed"
+    assert failed.error == "cast offline"
+    assert ran == ["off"]
+
+
+def test_full_lane_rejects_new_commands():
+    executor = ActionExecutor(workers=1, max_pending=2)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    executor.submit("lamp", "slow", slow)
+    assert started.wait(5)
+    executor.submit("lamp", "a", print)
+    executor.submit("lamp", "b", print)
+    with pytest.raises(ExecutorFull):
+        executor.submit("lamp", "c", print)
+    release.set()
@@ -0,0 +1,169 @@
+import threading
+
+import numpy as np
+
+
+class LedgerAnalytics:
+    """
+    Per-user portfolio analytics computed from the tracking ledger with NumPy.
+
+    The ledger-dependent part (FIFO cost basis, realized P&L, time-weighted
+    growth up to the last trade) is cached per user and reused until that user
+    trades again; only the valuation at current prices is redone per call.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def report(self, user_id, prices):
+        """
+        Return analytics for user_id, valuing open positions at prices.
+
+        prices maps symbol -> current price; symbols without a price are
+        valued at their last traded price.
+        """
+        ledger = self._ledger(user_id)
+        if ledger is None:
+            return {"positions": [], "totals": {
+                "market_value": 0.0, "cost_basis": 0.0, "realized": 0.0, "unrealized": 0.0,
+                "time_weighted_return": 0.0,
+            }}
+
+        symbols = ledger["symbols"]
+        current = np.array([prices.get(s, last) for s, last in zip(symbols, ledger["last_price"])], dtype=float)
+
+        held = ledger["held"]
+        market_value = held * current
+        unrealized = market_value - ledger["cost_basis"]
+        total_value = market_value.sum()
+        weights = market_value / total_value if total_value > 0 else np.zeros_like(market_value)
+
+        # Final sub-period: from the last trade to now
+        start_value = ledger["final_start_value"]
+        growth = ledger["growth"]
+        if start_value > 0:
+            growth *= total_value / start_value
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_cost = np.where(held > 0, ledger["cost_basis"] / held, 0.0)
+
+        positions = [
+            {
+                "symbol": symbols[i],
+                "shares": int(held[i]),
+                "cost_basis": float(ledger["cost_basis"][i]),
+                "avg_cost": float(avg_cost[i]),
+                "price": float(current[i]),
+                "market_value": float(market_value[i]),
+                "unrealized": float(unrealized[i]),
+                "realized": float(ledger["realized"][i]),
+                "weight": float(weights[i]),
+            }
+            for i in range(len(symbols))
+        ]
+        totals = {
+            "market_value": float(total_value),
+            "cost_basis": float(ledger["cost_basis"].sum()),
+            "realized": float(ledger["realized"].sum()),
+            "unrealized": float(unrealized.sum()),
+            "time_weighted_return": float(growth - 1.0),
+        }
+        return {"positions": positions, "totals": totals}
+
+    def _ledger(self, user_id):
+        # The newest trade id is the cache key, so trades made by any worker invalidate it
+        last_id = self.db.execute("SELECT MAX(id) AS last_id FROM tracking WHERE user_id = ?", user_id)[0]["last_id"]
+        if last_id is None:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached is not None and cached[0] == last_id:
+            return cached[1]
+
+        rows = self.db.execute(
+            "SELECT symbol, shares, price FROM tracking WHERE user_id = ? AND id <= ? ORDER BY id", user_id, last_id)
+        ledger = compute_ledger(
+            [row["symbol"].upper() for row in rows],
+            np.fromiter((row["shares"] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row["price"] for row in rows), dtype=float, count=len(rows)),
+        )
+        with self._lock:
+            self._cache[user_id] = (last_id, ledger)
+        return ledger
+
+
+def compute_ledger(symbol_list, shares, price):
+    """
+    Reduce a chronological ledger to per-symbol FIFO positions.
+
+    symbol_list holds one symbol per trade; shares is positive for buys and
+    negative for sells; price is the per-share trade price.
+    """
+    symbols, code = np.unique(np.asarray(symbol_list), return_inverse=True)
+    n, k = len(shares), len(symbols)
+
+    buy_qty = np.where(shares > 0, shares, 0).astype(float)
+    sell_qty = np.where(shares < 0, -shares, 0).astype(float)
+
+    # FIFO: lay every symbol's buys end to end on one quantity axis (grouped by
+    # symbol, chronological within a symbol). Cumulative cost along that axis
+    # is piecewise linear, so the cost of the q0..q1-th shares sold is C(q1) - C(q0).
+    order = np.lexsort((np.arange(n), code))
+    g_code, g_buy, g_sell, g_price = code[order], buy_qty[order], sell_qty[order], price[order]
+
+    cum_buy = np.cumsum(g_buy)
+    cum_cost = np.cumsum(g_buy * g_price)
+    cum_sell = np.cumsum(g_sell)
+
+    starts = np.searchsorted(g_code, np.arange(k))
+    buy_offset = (cum_buy - g_buy)[starts]          # shares bought in earlier symbols
+    sell_offset = (cum_sell - g_sell)[starts]
+
+    is_buy = g_buy > 0
+    axis_q = np.concatenate(([0.0], cum_buy[is_buy]))
+    axis_c = np.concatenate(([0.0], cum_cost[is_buy]))
+
+    sold_before = cum_sell - g_sell - sell_offset[g_code]
+    q0 = buy_offset[g_code] + sold_before
+    q1 = q0 + g_sell
+    sold_cost = np.interp(q1, axis_q, axis_c) - np.interp(q0, axis_q, axis_c)
+    realized = np.bincount(g_code, weights=np.where(g_sell > 0, g_sell * g_price - sold_cost, 0.0), minlength=k)
+
+    bought = np.bincount(g_code, weights=g_buy, minlength=k)
+    sold = np.bincount(g_code, weights=g_sell, minlength=k)
+    held = bought - sold
+    cost_basis = np.interp(buy_offset + bought, axis_q, axis_c) - np.interp(buy_offset + sold, axis_q, axis_c)
+
+    # Time-weighted return: chain the growth of each period between
+    # consecutive trades. Only the traded symbol's position and last price
+    # change at a trade, so the portfolio value is carried forward by that
+    # symbol's delta alone instead of revaluing every symbol after every trade.
+    g_shares = shares[order].astype(float)
+    cum_shares = np.cumsum(g_shares)
+    held_before = np.empty(n)
+    held_before[order] = cum_shares - g_shares - (cum_shares - g_shares)[starts][g_code]
+    prev_price = np.empty(n)
+    prev_price[order] = np.concatenate(([0.0], g_price[:-1]))   # a symbol's first trade has nothing held
+
+    # Value after each trade: the old position repriced at this trade, plus the shares traded
+    repriced = held_before * (price - prev_price)
+    values = np.cumsum(repriced + shares * price)
+    start_values = values[:-1]
+    end_values = values[:-1] + repriced[1:]
+    valid = (np.cumsum(shares)[:-1] > 0) & (start_values > 0)
+    growth = float(np.prod(end_values[valid] / start_values[valid]))
+
+    ends = np.append(starts[1:], n) - 1
+
+    return {
+        "symbols": [str(s) for s in symbols],
+        "held": held,
+        "cost_basis": np.where(held > 0, cost_basis, 0.0),
+        "realized": realized,
+        "last_price": g_price[ends],
+        "final_start_value": float(values[-1]) if held.any() else 0.0,
+        "growth": growth,
+    }
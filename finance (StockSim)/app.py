@@ -1,11 +1,27 @@
+import csv
+import io
+import json
+import math
 import os
+import queue
+import time
 
-from cs50 import SQL
-from flask import Flask, flash, redirect, render_template, request, session
-from flask_session import Session
+import click
+
+from flask import Flask, Response, flash, jsonify, make_response, redirect, render_template, request, session, stream_with_context, url_for
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from helpers import apology, login_required, lookup, usd
+from analytics import LedgerAnalytics
+from database import Database
+from fragment_cache import FragmentCache
+from metrics import metrics
+from holdings import apply_trade, apply_trades, init_holdings, rebuild, verify
+from leaderboard import Leaderboard
+from price_feed import PriceFeed
+from price_history import PriceHistory, portfolio_series
+from providers import VALID_SYMBOL
+from sessions import MemorySessionInterface, SQLiteSessionInterface
+from helpers import apology, login_required, lookup, lookup_many, quote_cache, symbol_index, usd
 
 # Configure application
 app = Flask(__name__)
@@ -13,24 +29,214 @@ app = Flask(__name__)
 # Custom filter
 app.jinja_env.filters["usd"] = usd
 
-# Configure session to use filesystem (instead of signed cookies)
+# Static files are cached for a year; templates link them with a version
+# query string so a changed file gets a new URL
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+
+
+@app.template_global()
+def static_url(filename):
+    """URL for a static file, versioned by its modification time"""
+    version = int(os.path.getmtime(os.path.join(app.static_folder, filename)))
+    return url_for("static", filename=filename, v=version)
+
+# Configure pooled SQLite data-access layer
+db = Database(os.environ.get("FINANCE_DB", "finance.db"))
+db.add_observer(metrics.observe_query)
+init_holdings(db)
+
+# Requests slower than this many milliseconds are logged with their SQL and
+# quote breakdown; 0 disables the log
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))
+
+# Configure server-side sessions (instead of signed cookies)
+# SESSION_BACKEND: "sqlite" (shared by all workers), "memory" (single process) or "filesystem"
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-Session(app)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")
+SESSION_LIFETIME = float(os.environ.get("SESSION_LIFETIME", 86400))
+
+if SESSION_BACKEND == "memory":
+    app.session_interface = MemorySessionInterface(lifetime=SESSION_LIFETIME)
+elif SESSION_BACKEND == "filesystem":
+    from flask_session import Session
+
+    app.config["SESSION_TYPE"] = "filesystem"
+    Session(app)
+else:
+    app.session_interface = SQLiteSessionInterface(db, lifetime=SESSION_LIFETIME)
+    app.session_interface.start_sweeper()
+
+# Symbols users already hold are suggested even if the bundled listing lacks them
+if symbol_index is not None:
+    for row in db.execute("SELECT DISTINCT symbol FROM holdings"):
+        symbol_index.add(row["symbol"], row["symbol"])
+
+# Keyset pagination of history walks tracking by (user_id, id)
+db.execute("CREATE INDEX IF NOT EXISTS tracking_user_id ON tracking(user_id, id)")
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+# Background refresh of every held symbol; PRICE_FEED_INTERVAL=0 disables it.
+# Each open /prices/stream holds a request thread for as long as the page is
+# open, so at most PRICE_STREAM_LIMIT of them are served at once
+price_feed = PriceFeed(db, lookup_many, interval=float(os.environ.get("PRICE_FEED_INTERVAL", 15)),
+                       max_subscribers=int(os.environ.get("PRICE_STREAM_LIMIT", 32)))
+
+# Per-symbol tick history for charts, fed by the price feed and by trades
+price_history = PriceHistory(os.environ.get("PRICE_HISTORY_DIR", "price_history"))
+
+
+def record_tick(symbol, timestamp, price):
+    """Append a tick to the chart history; a failed write is logged, never raised"""
+    try:
+        price_history.append(symbol, timestamp, price)
+    except (ValueError, OSError) as e:
+        # Charts are a side effect: never fail a trade or a price update over one
+        app.logger.warning("Could not record price history for %s: %s", symbol, e)
+
+
+def record_ticks(quotes, timestamp):
+    for symbol, quote in quotes.items():
+        record_tick(symbol, timestamp, quote["price"])
+
+
+price_feed.add_listener(lambda changed: record_ticks(changed, time.time()))
+
+CHART_DEFAULT_DAYS = 7
+CHART_DEFAULT_POINTS = 200
+
+
+# Ledger analytics, cached per user until their next trade
+analytics = LedgerAnalytics(db)
+
+# Rendered portfolio and history pages, cached per user until their next trade
+fragment_cache = FragmentCache()
+
+# Ranking of all users by total value; feed price changes revalue only the
+# holders of the changed symbols
+leaderboard = Leaderboard(db)
+price_feed.add_listener(leaderboard.update_prices)
+
+LEADERBOARD_SIZE = 25
+LEADERBOARD_MAX_SIZE = 100
+
+
+def current_quotes(symbols):
+    """Quotes for symbols from the price feed, fetching only what it hasn't seen yet."""
+    if not price_feed.running:
+        # Nothing refreshes the feed's prices while it is off, so they would
+        # stay at whatever was first fetched; go to the quote cache instead
+        return lookup_many(symbols)
+    quotes = price_feed.get_many(symbols)
+    missing = [sym for sym in symbols if sym.upper() not in quotes]
+    if missing:
+        fetched = lookup_many(missing)
+        price_feed.update(fetched)
+        quotes.update(fetched)
+    return quotes
+
+
+def symbols_to_prefetch():
+    """
+    Symbols the current request's view will quote, for the ASGI server to
+    fetch before running it (see asgi.py)
+    """
+    user_id = session.get("user_id")
+    if user_id is None:
+        return []
+    if request.method == "POST" and request.endpoint in ("quote", "buy", "sell"):
+        symbol = request.form.get("symbol")
+        return [symbol] if symbol else []
+    if request.method == "POST" and request.endpoint == "bulk_orders":
+        data = request.get_json(silent=True)
+        orders = data.get("orders") if isinstance(data, dict) else None
+        if not isinstance(orders, list):
+            return []
+        return [order["symbol"] for order in orders
+                if isinstance(order, dict) and isinstance(order.get("symbol"), str)]
+    if request.method == "GET" and request.endpoint == "index":
+        rows = db.execute("SELECT symbol FROM holdings WHERE user_id = ? AND shares > 0", user_id)
+        symbols = [row["symbol"] for row in rows]
+        if price_feed.running:
+            # The feed already has prices for everything it has polled
+            known = price_feed.get_many(symbols)
+            symbols = [sym for sym in symbols if sym.upper() not in known]
+        return symbols
+    return []
+
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+
+@app.before_request
+def start_price_feed():
+    """Start the price feed with the first request"""
+    price_feed.start()
+
 
-# Configure CS50 Library to use SQLite database
-db = SQL("sqlite:///finance.db")
+def cached_page(entry):
+    """Respond with a cached (etag, html) page, or 304 if the browser already has it"""
+    etag, html = entry
+    response = make_response(html)
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.after_request
 def after_request(response):
-    """Ensure responses aren't cached"""
+    """Set the cache policy per route"""
+    if request.endpoint == "static":
+        # Long-lived caching is set by send_file
+        return response
+    if "ETag" in response.headers:
+        # Browser may keep the page but must revalidate it every time
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     response.headers["Expires"] = 0
     response.headers["Pragma"] = "no-cache"
     return response
 
 
+def record_request(status):
+    """Add the finished request to the metrics and log it if it was slow"""
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    recorded = metrics.end_request(route, request.method, status)
+    if recorded is None:
+        return
+    elapsed, trace = recorded
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        app.logger.warning("Slow request %s %s %.1fms (%s)", request.method, request.full_path.rstrip("?"),
+                           elapsed * 1000, trace.summary())
+
+
+@app.after_request
+def finish_request_metrics(response):
+    record_request(response.status_code)
+    return response
+
+
+@app.teardown_request
+def finish_failed_request_metrics(exc):
+    # Only still pending when the view raised before after_request ran
+    record_request(500)
+
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    # Back to the pool, so a thread per request doesn't mean a connection per request
+    db.release()
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Request, SQL and quote provider timings in Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/")
 @login_required
 def index():
@@ -38,33 +244,171 @@ def index():
 
     user_id = session["user_id"]
 
+    # Valuations only change with the user's trades and cash or the feed's
+    # prices. Keying on what's in the database, not just on invalidate(),
+    # keeps the page right when another worker handled the trade
+    last_trade, cash = ledger_state(user_id)
+    key = ("index", price_feed.version, last_trade, cash)
+    cached = fragment_cache.get(user_id, key) if price_feed.running else None
+    if cached is not None:
+        return cached_page(cached)
+
     track_rows = db.execute(
-        "SELECT symbol, SUM(shares) AS tot_shares FROM tracking WHERE user_id = ? GROUP BY symbol HAVING tot_shares > 0", user_id)
+        "SELECT symbol, shares AS tot_shares FROM holdings WHERE user_id = ? AND shares > 0", user_id)
     stock_info = []
     grand_total = 0
 
+    quotes = current_quotes([row["symbol"] for row in track_rows])
+
     for row in track_rows:
         sym = row["symbol"]
         shares = row["tot_shares"]
 
-        stock = lookup(sym)
+        stock = quotes.get(sym.upper())
+        if stock is None:
+            # Quote missed the batch deadline; show the holding without a value
+            stock_info.append({
+                "symbol": sym.upper(),
+                "name": sym,
+                "shares": shares,
+                "price": "N/A",
+                "total": "N/A",
+                "price_value": None
+            })
+            continue
+
         price = stock["price"]
         total = shares * price
         grand_total = grand_total + total
 
         stock_info.append({
+            "symbol": sym.upper(),
             "name": stock["name"],
             "shares": shares,
             "price": usd(price),
-            "total": usd(total)
+            "total": usd(total),
+            "price_value": price
         })
 
-    user_rows = db.execute("SELECT cash FROM users WHERE id = ?", user_id)
-    cash = user_rows[0]["cash"]
-
     grand_total = grand_total + cash
 
-    return render_template("index.html", stock_info=stock_info, cash=usd(cash), grand_total=usd(grand_total))
+    html = render_template("index.html", stock_info=stock_info, cash=usd(cash), grand_total=usd(grand_total),
+                           cash_value=cash)
+
+    if not price_feed.running or any(stock["price_value"] is None for stock in stock_info):
+        return html
+    return cached_page(fragment_cache.put(user_id, key, html))
+
+
+def ledger_state(user_id):
+    """The user's newest tracking id and cash: what their cached pages depend on"""
+    row = db.execute(
+        "SELECT (SELECT MAX(id) FROM tracking WHERE user_id = ?) AS last_trade, cash FROM users WHERE id = ?",
+        user_id, user_id)[0]
+    return row["last_trade"], row["cash"]
+
+
+def analytics_report(user_id):
+    """Analytics for user_id valued at current prices"""
+    rows = db.execute("SELECT symbol FROM holdings WHERE user_id = ? AND shares > 0", user_id)
+    quotes = current_quotes([row["symbol"] for row in rows])
+    return analytics.report(user_id, {sym: quote["price"] for sym, quote in quotes.items()})
+
+
+@app.route("/analytics")
+@login_required
+def analytics_page():
+    """Show cost basis, P&L and returns"""
+    report = analytics_report(session["user_id"])
+    return render_template("analytics.html", positions=report["positions"], totals=report["totals"])
+
+
+@app.route("/api/analytics")
+@login_required
+def analytics_api():
+    """Cost basis, P&L and returns as JSON"""
+    return jsonify(analytics_report(session["user_id"]))
+
+
+@app.route("/leaderboard")
+@login_required
+def leaderboard_page():
+    """Rank every user by cash plus holdings at the latest prices"""
+    try:
+        size = int(request.args.get("size", LEADERBOARD_SIZE))
+    except ValueError:
+        return apology("invalid page size")
+    size = max(1, min(size, LEADERBOARD_MAX_SIZE))
+
+    standing = leaderboard.rank(session["user_id"])
+    return render_template("leaderboard.html", leaders=leaderboard.top(size), standing=standing,
+                           user_id=session["user_id"])
+
+
+@app.route("/chart")
+@login_required
+def chart():
+    """Show portfolio value over time"""
+    return render_template("chart.html")
+
+
+@app.route("/api/chart")
+@login_required
+def chart_api():
+    """Portfolio value series for the last ?days=, downsampled to ?points="""
+    user_id = session["user_id"]
+    days = request.args.get("days", CHART_DEFAULT_DAYS, type=float)
+    if not math.isfinite(days):
+        return jsonify({"error": "days must be a finite number"}), 400
+    days = min(max(days, 0.01), 3650)
+    points = min(max(request.args.get("points", CHART_DEFAULT_POINTS, type=int), 2), 2000)
+
+    rows = db.execute(
+        "SELECT symbol, shares, price, CAST(strftime('%s', purchase_time) AS INTEGER) * 1000 AS time_ms "
+        "FROM tracking WHERE user_id = ? ORDER BY id", user_id)
+    trades = [(row["symbol"], row["shares"], row["price"], row["time_ms"]) for row in rows]
+
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - int(days * 86400 * 1000)
+    times, values = portfolio_series(price_history, trades, start_ms, end_ms, points)
+    return jsonify({"t": times.tolist(), "value": values.round(2).tolist()})
+
+
+def held_symbols(user_id):
+    """Symbols user_id currently holds"""
+    rows = db.execute("SELECT symbol FROM holdings WHERE user_id = ? AND shares > 0", user_id)
+    return [row["symbol"] for row in rows]
+
+
+def price_events(changed):
+    """Server-sent event frames for a dict of changed quotes"""
+    return "".join(f"data: {json.dumps({'symbol': quote['symbol'], 'price': quote['price']})}\n\n"
+                   for quote in changed.values())
+
+
+@app.route("/prices/stream")
+@login_required
+def price_stream():
+    """Push price changes for the user's holdings as server-sent events"""
+    subscriber = price_feed.subscribe(held_symbols(session["user_id"]))
+    if subscriber is None:
+        # Too many open streams; the page keeps the prices it was rendered with
+        return Response("too many price streams open", status=503, headers={"Retry-After": "30"})
+
+    def event_stream():
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                changed = subscriber.get(timeout=15)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            yield price_events(changed)
+
+    response = Response(stream_with_context(event_stream()), content_type="text/event-stream")
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(subscriber.close)
+    return response
 
 
 @app.route("/buy", methods=["GET", "POST"])
@@ -90,17 +434,23 @@ def buy():
         if shares <= 0:
             return apology("please provide a positive integer")
 
-        rows = db.execute("SELECT cash from users WHERE id = ?", user_id)
-        cash = rows[0]["cash"]
-
         total = shares * stock["price"]
-        if total > cash:
-            return apology("lack of funds to make that purchase")
 
-        db.execute("UPDATE users SET cash = cash - ? WHERE id = ?", total, user_id)
-        db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
-                   user_id, stock["symbol"], shares, stock["price"])
+        with db.transaction():
+            rows = db.execute("SELECT cash from users WHERE id = ?", user_id)
+            cash = rows[0]["cash"]
+
+            if total > cash:
+                return apology("lack of funds to make that purchase")
+
+            db.execute("UPDATE users SET cash = cash - ? WHERE id = ?", total, user_id)
+            db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                       user_id, stock["symbol"], shares, stock["price"])
+            apply_trade(db, user_id, stock["symbol"], shares, stock["price"])
 
+        fragment_cache.invalidate(user_id)
+        leaderboard.refresh_user(user_id)
+        record_tick(stock["symbol"], time.time(), stock["price"])
         return redirect("/")
 
     else:
@@ -108,18 +458,110 @@ def buy():
         return render_template("buy.html")
 
 
+@app.route("/api/orders", methods=["POST"])
+@login_required
+def bulk_orders():
+    """Execute a batch of buy and sell orders atomically"""
+    user_id = session["user_id"]
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "request body must be a JSON object"}), 400
+    orders = data.get("orders")
+    if not isinstance(orders, list) or not orders:
+        return jsonify({"error": "please provide a list of orders"}), 400
+
+    parsed = []
+    for i, order in enumerate(orders):
+        if not isinstance(order, dict):
+            return jsonify({"error": f"order {i} must be an object"}), 400
+        sym = order.get("symbol")
+        side = order.get("side")
+        shares = order.get("shares")
+        if not isinstance(sym, str) or not sym.strip():
+            return jsonify({"error": f"order {i}: please provide stock symbol"}), 400
+        if not VALID_SYMBOL.match(sym.strip().upper()):
+            return jsonify({"error": f"order {i}: invalid stock symbol"}), 400
+        if side not in ("buy", "sell"):
+            return jsonify({"error": f"order {i}: side must be buy or sell"}), 400
+        if not isinstance(shares, int) or isinstance(shares, bool) or shares <= 0:
+            return jsonify({"error": f"order {i}: please provide a positive integer"}), 400
+        parsed.append((sym.strip().upper(), shares if side == "buy" else -shares))
+
+    # Price every symbol in one concurrent fetch
+    quotes = lookup_many({sym for sym, _ in parsed})
+    unpriced = sorted({sym for sym, _ in parsed if sym not in quotes})
+    if unpriced:
+        return jsonify({"error": "stock symbol invalid or unavailable", "symbols": unpriced}), 400
+
+    # Buys are recorded before sells so the ledger never sells shares it hasn't bought yet
+    trades = [(sym, shares, quotes[sym]["price"]) for sym, shares in parsed]
+    trades.sort(key=lambda trade: trade[1] < 0)
+    net_cash = -sum(shares * price for _, shares, price in trades)
+
+    net_shares = {}
+    for sym, shares, _ in trades:
+        net_shares[sym] = net_shares.get(sym, 0) + shares
+
+    with db.transaction():
+        cash = db.execute("SELECT cash FROM users WHERE id = ?", user_id)[0]["cash"]
+        if cash + net_cash < 0:
+            return jsonify({"error": "lack of funds to make these purchases"}), 400
+
+        placeholders = ", ".join("?" for _ in net_shares)
+        held = {
+            row["symbol"]: row["shares"]
+            for row in db.execute(
+                f"SELECT symbol, shares FROM holdings WHERE user_id = ? AND symbol IN ({placeholders})",
+                user_id, *net_shares)
+        }
+        short = sorted(sym for sym, change in net_shares.items() if held.get(sym, 0) + change < 0)
+        if short:
+            return jsonify({"error": "shares not enough", "symbols": short}), 400
+
+        db.executemany("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                       [(user_id, sym, shares, price) for sym, shares, price in trades])
+        db.execute("UPDATE users SET cash = cash + ? WHERE id = ?", net_cash, user_id)
+        apply_trades(db, user_id, trades)
+
+    fragment_cache.invalidate(user_id)
+    leaderboard.refresh_user(user_id)
+    now = time.time()
+    for sym in net_shares:
+        record_tick(sym, now, quotes[sym]["price"])
+
+    return jsonify({
+        "filled": [{"symbol": sym, "shares": shares, "price": price} for sym, shares, price in trades],
+        "cash": cash + net_cash,
+    })
+
+
 @app.route("/history")
 @login_required
 def history():
     """Show history of transactions"""
     user_id = session["user_id"]
 
+    after = request.args.get("after", 0, type=int)
+    size = request.args.get("size", HISTORY_PAGE_SIZE, type=int)
+    size = max(1, min(size, HISTORY_MAX_PAGE_SIZE))
+
+    last_trade, _ = ledger_state(user_id)
+    key = ("history", after, size, last_trade)
+    cached = fragment_cache.get(user_id, key)
+    if cached is not None:
+        return cached_page(cached)
+
+    # Fetch one extra row to learn whether another page follows
     rows = db.execute(
-        "SELECT symbol, shares, price, purchase_time FROM tracking WHERE user_id = ?", user_id)
+        "SELECT id, symbol, shares, price, purchase_time FROM tracking WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+        user_id, after, size + 1)
+
+    next_after = rows[size - 1]["id"] if len(rows) > size else None
 
     transactions = []
 
-    for row in rows:
+    for row in rows[:size]:
         if row["shares"] > 0:
             trans_type = "BOUGHT"
         else:
@@ -133,15 +575,64 @@ def history():
             "Timestamp": row["purchase_time"],
         })
 
-    return render_template("history.html", transactions=transactions)
+    html = render_template("history.html", transactions=transactions, size=size,
+                           first_page=after == 0, next_after=next_after)
+    return cached_page(fragment_cache.put(user_id, key, html))
+
+
+@app.route("/history/export")
+@login_required
+def history_export():
+    """Stream the full transaction history as CSV or JSON"""
+    user_id = session["user_id"]
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "json"):
+        return apology("format must be csv or json")
+
+    rows = db.iterate(
+        "SELECT id, symbol, shares, price, purchase_time FROM tracking WHERE user_id = ? ORDER BY id", user_id)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["id", "type", "symbol", "shares", "price", "timestamp"])
+        for row in rows:
+            writer.writerow([row["id"], "BOUGHT" if row["shares"] > 0 else "SOLD", row["symbol"],
+                             abs(row["shares"]), row["price"], row["purchase_time"]])
+            if buffer.tell() >= 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_json():
+        yield "["
+        separator = ""
+        for row in rows:
+            yield separator + json.dumps({
+                "id": row["id"],
+                "type": "BOUGHT" if row["shares"] > 0 else "SOLD",
+                "symbol": row["symbol"],
+                "shares": abs(row["shares"]),
+                "price": row["price"],
+                "timestamp": row["purchase_time"],
+            })
+            separator = ","
+        yield "]"
+
+    generate = generate_csv if fmt == "csv" else generate_json
+    mimetype = "text/csv" if fmt == "csv" else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=history.{fmt}"})
 
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
     """Log user in"""
 
-    # Forget any user_id
-    session.clear()
+    # Forget any user_id (an empty session is left alone, so a plain GET doesn't write one)
+    if session:
+        session.clear()
 
     # User reached route via POST (as by submitting a form via POST)
     if request.method == "POST":
@@ -179,8 +670,9 @@ def login():
 def logout():
     """Log user out"""
 
-    # Forget any user_id
-    session.clear()
+    # Forget any user_id (an empty session is left alone, so a plain GET doesn't write one)
+    if session:
+        session.clear()
 
     # Redirect user to login form
     return redirect("/")
@@ -206,6 +698,17 @@ def quote():
         return render_template("quote.html")
 
 
+@app.route("/api/symbols")
+@login_required
+def symbol_search():
+    """Autocomplete tickers and company names for ?prefix="""
+    prefix = request.args.get("prefix", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    if symbol_index is None:
+        return jsonify([])
+    return jsonify(symbol_index.search(prefix, limit))
+
+
 @app.route("/register", methods=["GET", "POST"])
 def register():
     """Register user"""
@@ -226,9 +729,10 @@ def register():
         hs_password = generate_password_hash(password)
 
         try:
-            db.execute("INSERT INTO users (username, hash) VALUES (?,?)", username, hs_password)
+            user_id = db.execute("INSERT INTO users (username, hash) VALUES (?,?)", username, hs_password)
         except ValueError:
             return apology("username already exists")
+        leaderboard.refresh_user(user_id)
 
         return redirect("/")
 
@@ -256,12 +760,6 @@ def sell():
         if shares <= 0:
             return apology("please provide a positive integer")
 
-        rows = db.execute(
-            "SELECT COALESCE(SUM(shares), 0) AS tot_shares FROM tracking WHERE user_id = ? AND symbol = ? GROUP BY symbol", user_id, sym)
-
-        if len(rows) != 1 or rows[0]["tot_shares"] < shares:
-            return apology("shares not enough")
-
         stock = lookup(sym)
         if stock is None:
             return apology("Stock Symbol Invalid")
@@ -269,16 +767,27 @@ def sell():
         per_share = stock["price"]
         owned_shares = shares * per_share
 
-        db.execute("UPDATE users SET cash = cash + ? WHERE id = ?", owned_shares, user_id)
+        with db.transaction():
+            rows = db.execute(
+                "SELECT shares AS tot_shares FROM holdings WHERE user_id = ? AND symbol = ?", user_id, sym)
 
-        db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
-                   user_id, sym, -shares, per_share)
+            if len(rows) != 1 or rows[0]["tot_shares"] < shares:
+                return apology("shares not enough")
 
+            db.execute("UPDATE users SET cash = cash + ? WHERE id = ?", owned_shares, user_id)
+
+            db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                       user_id, sym, -shares, per_share)
+            apply_trade(db, user_id, sym, -shares, per_share)
+
+        fragment_cache.invalidate(user_id)
+        leaderboard.refresh_user(user_id)
+        record_tick(sym, time.time(), per_share)
         return redirect("/")
 
     else:
         rows = db.execute(
-            "SELECT symbol, SUM(shares) AS Shares FROM tracking WHERE user_id = ? GROUP BY symbol HAVING shares > 0", user_id)
+            "SELECT symbol FROM holdings WHERE user_id = ? AND shares > 0", user_id)
 
         symbols = [row["symbol"] for row in rows]
 
@@ -305,9 +814,42 @@ def cash_add():
         if amount <= 0:
             return apology("amount must be positive")
 
-        db.execute("Update users SET cash = cash + ? WHERE id = ?", amount, user_id)
+        with db.transaction():
+            db.execute("Update users SET cash = cash + ? WHERE id = ?", amount, user_id)
+        fragment_cache.invalidate(user_id)
+        leaderboard.refresh_user(user_id)
 
         return redirect("/")
 
     else:
         return render_template("cash_add.html")
+
+
+@app.route("/api/quote_cache")
+@login_required
+def quote_cache_stats():
+    """Show quote cache hit/miss counters"""
+    return jsonify(quote_cache.stats())
+
+
+@app.cli.group("holdings")
+def holdings_cli():
+    """Maintain the materialized holdings table."""
+
+
+@holdings_cli.command("rebuild")
+def holdings_rebuild():
+    """Rebuild holdings from the tracking ledger."""
+    count = rebuild(db)
+    click.echo(f"Rebuilt {count} holdings from tracking")
+
+
+@holdings_cli.command("verify")
+def holdings_verify():
+    """Check holdings against the tracking ledger."""
+    mismatches = verify(db)
+    for user_id, symbol, expected, actual in mismatches:
+        click.echo(f"user {user_id} {symbol}: expected {expected}, found {actual}")
+    if mismatches:
+        raise SystemExit(1)
+    click.echo("holdings match tracking")
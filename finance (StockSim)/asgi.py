@@ -0,0 +1,254 @@
+"""
+ASGI entry point for StockSim.
+
+    hypercorn asgi:application --bind 0.0.0.0:5000
+
+The Flask views stay synchronous and run on a bounded pool of WSGI_THREADS
+threads. Before a quote-bound request (portfolio, quote, buy, sell, bulk
+orders) reaches its view, the symbols it needs are fetched as coroutines on
+the quote loop while the request waits on this server's event loop, so a
+request waiting on the quote API holds no thread at all. The view then runs
+with those quotes already in hand and only holds a thread for its own
+database and template work.
+
+/prices/stream is served here on the event loop rather than through Flask:
+an open portfolio page costs a coroutine waiting on its subscription, not a
+pool thread for as long as the page stays open.
+"""
+import asyncio
+import contextvars
+import functools
+import io
+import os
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import session
+
+from app import app, held_symbols, price_events, price_feed, symbols_to_prefetch
+from helpers import prefetch_quotes, prefetched_quotes
+from price_feed import Subscription
+
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", 16))
+MAX_BODY = int(os.environ.get("MAX_BODY", 1024 * 1024))
+
+PRICE_STREAM_PING = 15
+
+wsgi_pool = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class AsyncSubscription(Subscription):
+    """Price subscription that also wakes a coroutine on the event loop"""
+
+    def __init__(self, feed, symbols, loop):
+        super().__init__(feed, symbols)
+        self.loop = loop
+        self.ready = asyncio.Event()
+
+    def offer(self, changed):
+        super().offer(changed)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+def make_environ(scope, body):
+    """WSGI environ for an ASGI http scope and its request body"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+            key = name
+        else:
+            key = "HTTP_" + name
+        environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+def request_symbols(environ):
+    """Symbols the request will quote (runs on the WSGI pool; reads the session and maybe the database)"""
+    with app.request_context(environ):
+        try:
+            return symbols_to_prefetch()
+        except Exception as e:
+            app.logger.warning("Could not work out quotes to prefetch: %s", e)
+            return []
+
+
+def stream_symbols(environ):
+    """Symbols to stream prices for, or None if nobody is logged in"""
+    with app.request_context(environ):
+        user_id = session.get("user_id")
+        return None if user_id is None else held_symbols(user_id)
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def price_stream(send, receive, symbols):
+    """/prices/stream as server-sent events, waiting on the loop instead of a thread"""
+    factory = functools.partial(AsyncSubscription, loop=asyncio.get_running_loop())
+    subscriber = price_feed.subscribe(symbols, factory=factory)
+    if subscriber is None:
+        # Too many open streams; the page keeps the prices it was rendered with
+        body = b"too many price streams open"
+        await send({"type": "http.response.start", "status": 503,
+                    "headers": [(b"retry-after", b"30"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+        return
+
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]})
+        await send({"type": "http.response.body", "body": b"retry: 5000\n\n", "more_body": True})
+        while not disconnected.done():
+            ready = asyncio.ensure_future(subscriber.ready.wait())
+            done, _ = await asyncio.wait({ready, disconnected}, timeout=PRICE_STREAM_PING,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            ready.cancel()
+            subscriber.ready.clear()
+            changed = subscriber.take()
+            if changed:
+                frame = price_events(changed)
+            elif not done:
+                frame = ": ping\n\n"
+            else:
+                continue
+            await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+    finally:
+        disconnected.cancel()
+        subscriber.close()
+
+
+async def read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise ValueError("request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    try:
+        body = await read_body(receive)
+    except ValueError:
+        await send({"type": "http.response.start", "status": 413, "headers": [(b"content-length", b"0")]})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if body is None:
+        return
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+
+    if scope["method"] == "GET" and scope["path"] == "/prices/stream":
+        symbols = await loop.run_in_executor(wsgi_pool, stream_symbols, make_environ(scope, body))
+        if symbols is not None:
+            await price_stream(send, receive, symbols)
+            return
+        # Not logged in: Flask redirects to the login page
+
+    symbols = None
+    if scope["method"] == "POST" or scope["path"] == "/":
+        symbols = await loop.run_in_executor(wsgi_pool, request_symbols, make_environ(scope, body))
+    if symbols:
+        # Waits on the quote loop without holding a thread
+        context.run(prefetched_quotes.set, await prefetch_quotes(symbols))
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        await wait_disconnect(receive)
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await run_wsgi(loop, context, make_environ(scope, body), send, disconnected)
+    finally:
+        watcher.cancel()
+
+
+async def run_wsgi(loop, context, environ, send, disconnected):
+    response = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response.get("sent"):
+            raise exc_info[1].with_traceback(exc_info[2])
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                               for name, value in headers]
+        return written.append
+
+    # Each step of the view (and of a streamed body) runs on the pool with
+    # the request's context, so it sees the prefetched quotes
+    result = await loop.run_in_executor(wsgi_pool, context.run, app, environ, start_response)
+    chunks = iter(result)
+    try:
+        while not disconnected.is_set():
+            chunk = await loop.run_in_executor(wsgi_pool, context.run, next, chunks, None)
+            if not response.get("sent"):
+                await send({"type": "http.response.start", "status": response["status"],
+                            "headers": response["headers"]})
+                response["sent"] = True
+            if written:
+                await send({"type": "http.response.body", "body": b"".join(written), "more_body": True})
+                written.clear()
+            if chunk is None:
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    finally:
+        if hasattr(result, "close"):
+            await loop.run_in_executor(wsgi_pool, context.run, result.close)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            wsgi_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
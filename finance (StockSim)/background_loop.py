@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running on its own daemon thread.
+
+    Synchronous code hands coroutines to it with run(); any number of them
+    can be waiting on the network at once without each holding a thread.
+    The loop and its thread are started on first use.
+    """
+
+    def __init__(self, name="asyncio"):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro, timeout=None):
+        """Run coro on the loop, blocking the calling thread until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
@@ -0,0 +1,234 @@
+"""
+Compare concurrent quote requests through the real app under each server.
+
+Each server runs in its own process against a throwaway copy of finance.db
+and the fake provider with a fixed upstream latency (quote cache disabled,
+so every request goes upstream). N logged-in clients then POST /quote at
+the same time, optionally while --tabs other users keep a portfolio page's
+/prices/stream open. Prints throughput, latency and the peak number of
+threads in the server process for:
+
+  wsgi-threads  werkzeug's threaded server, a thread per connection (as
+                `flask run` serves the app), fetching on the request thread
+  wsgi-pool     the same app on a fixed pool of --threads threads (as a
+                gunicorn gthread worker would), fetching on the request thread
+  asgi          asgi.py under hypercorn with WSGI_THREADS=--threads; quotes
+                are awaited on the event loop before the view runs
+
+    python benchmarks/bench_quotes.py --clients 64 --threads 8 --latency 0.2
+    python benchmarks/bench_quotes.py --clients 16 --threads 8 --tabs 16
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("wsgi-threads", "wsgi-pool", "asgi")
+
+
+def serve_wsgi(port, threads):
+    """Run the app on werkzeug, a thread per connection or (threads > 0) a fixed pool"""
+    import logging
+
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer, make_server
+
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    if not threads:
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+        return
+
+    class PooledWSGIServer(BaseWSGIServer):
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, app).serve_forever()
+
+
+def serve_asgi(port):
+    """Run asgi.py under hypercorn in this process, so its threads are counted"""
+    import asyncio
+
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    from asgi import application
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.backlog = 1024
+    config.loglevel = "ERROR"
+    asyncio.run(serve(application, config))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, tmp, args):
+    db_path = os.path.join(tmp, f"{mode}.db")
+    shutil.copy(os.path.join(ROOT, "finance.db"), db_path)
+    port = free_port()
+    env = dict(os.environ,
+               FINANCE_DB=db_path,
+               PRICE_HISTORY_DIR=os.path.join(tmp, f"{mode}-history"),
+               PRICE_FEED_INTERVAL="0",
+               QUOTE_PROVIDER="fake",
+               QUOTE_FAKE_LATENCY=str(args.latency),
+               QUOTE_CACHE_TTL="0",
+               QUOTE_CACHE_NEGATIVE_TTL="0",
+               QUOTE_ASYNC="1" if mode == "asgi" else "0",
+               PRICE_STREAM_LIMIT=str(max(32, args.tabs)),
+               WSGI_THREADS=str(args.threads))
+    threads = args.threads if mode == "wsgi-pool" else 0
+    command = [sys.executable, os.path.abspath(__file__), "--serve", str(port), "--server", mode,
+               "--threads", str(threads)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            requests.get(base + "/login", timeout=1)
+            return process, base
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def thread_count(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+def log_in(base, index):
+    http = requests.Session()
+    username = f"bench-{os.getpid()}-{index}"
+    http.post(base + "/register", data={"username": username, "password": "bench", "confirmation": "bench"})
+    http.post(base + "/login", data={"username": username, "password": "bench"}, allow_redirects=False)
+    return http
+
+
+def run(mode, tmp, args, symbols):
+    process, base = start_server(mode, tmp, args)
+    try:
+        sessions = [log_in(base, i) for i in range(args.clients + args.tabs)]
+        # Open portfolio pages: each keeps its price stream open for the whole run
+        tabs = []
+        for http in sessions[args.clients:]:
+            try:
+                tabs.append(http.get(base + "/prices/stream", stream=True, timeout=args.timeout))
+            except requests.RequestException:
+                pass  # a server out of threads never answers; the quote requests will show it
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        peak = [thread_count(process.pid)]
+        done = threading.Event()
+        barrier = threading.Barrier(args.clients + 1)
+
+        def watch():
+            while not done.wait(0.01):
+                peak[0] = max(peak[0], thread_count(process.pid))
+
+        def client(index):
+            rng = random.Random(index)
+            http = sessions[index]
+            barrier.wait()
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                try:
+                    response = http.post(base + "/quote", data={"symbol": rng.choice(symbols)},
+                                         timeout=args.timeout)
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    errors[0] += not ok
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        clients = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        for thread in clients:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        watcher.join()
+        for tab in tabs:
+            tab.close()
+        return elapsed, latencies, errors[0], peak[0], len(tabs)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent logged-in clients")
+    parser.add_argument("--rounds", type=int, default=10, help="quote requests per client")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake upstream latency (s)")
+    parser.add_argument("--threads", type=int, default=8, help="request threads for wsgi-pool and asgi")
+    parser.add_argument("--tabs", type=int, default=0, help="portfolio pages holding /prices/stream open meanwhile")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds before a request counts as an error")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated servers to run")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        if args.server == "asgi":
+            serve_asgi(args.serve)
+        else:
+            serve_wsgi(args.serve, args.threads)
+        return
+
+    from symbols import SymbolIndex
+
+    symbols = sorted(SymbolIndex.load(os.path.join(ROOT, "listings.csv"))._names)
+    print(f"{args.clients} clients x {args.rounds} POST /quote, {args.latency * 1000:.0f}ms upstream latency, "
+          f"{args.threads} request threads for wsgi-pool and asgi, {args.tabs} open price streams")
+    print(f"{'server':>12}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'errors':>6}  {'server threads':>14}  "
+          f"{'open tabs':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(","):
+            elapsed, latencies, errors, threads, tabs = run(mode, tmp, args, symbols)
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            print(f"{mode:>12}  {len(latencies) / elapsed:8.1f}  {cuts[49] * 1000:8.1f}  {cuts[94] * 1000:8.1f}  "
+                  f"{errors:6d}  {threads:14d}  {tabs:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare per-request session overhead across session backends.
+
+Each backend serves a minimal app through Flask's test client: one route
+that writes the session (as /login does) and one that only reads it (as every
+@login_required page does). Reported times are microseconds per request.
+
+    python benchmarks/bench_sessions.py --requests 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session  # noqa: E402
+
+from database import Database  # noqa: E402
+from sessions import MemorySessionInterface, SQLiteSessionInterface  # noqa: E402
+
+
+def make_app(backend, tmp):
+    app = Flask(__name__)
+    app.config["SESSION_PERMANENT"] = False
+
+    if backend == "filesystem":
+        from flask_session import Session
+
+        app.config["SESSION_TYPE"] = "filesystem"
+        app.config["SESSION_FILE_DIR"] = os.path.join(tmp, "flask_session")
+        Session(app)
+    elif backend == "memory":
+        app.session_interface = MemorySessionInterface()
+    else:
+        app.session_interface = SQLiteSessionInterface(Database(os.path.join(tmp, "sessions.db")))
+
+    @app.route("/write")
+    def write():
+        session.clear()
+        session["user_id"] = 1
+        return ""
+
+    @app.route("/read")
+    def read():
+        return str(session.get("user_id"))
+
+    return app
+
+
+def timed(client, path, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get(path)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--backends", nargs="+", default=["filesystem", "memory", "sqlite"])
+    args = parser.parse_args()
+
+    print(f"{'backend':>10}  {'write p50':>10}  {'read p50':>10}  {'read p95':>10}")
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                app = make_app(backend, tmp)
+            except ImportError as e:
+                print(f"{backend:>10}  skipped ({e})")
+                continue
+
+            client = app.test_client()
+            writes = timed(client, "/write", args.requests // 10 or 1)
+            reads = timed(client, "/read", args.requests)
+            p95 = statistics.quantiles(reads, n=20)[-1]
+            print(f"{backend:>10}  {statistics.median(writes):10.1f}  {statistics.median(reads):10.1f}  {p95:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+HTTP load test for StockSim against an offline quote provider.
+
+Starts the app on a local threaded server with a throwaway copy of
+finance.db, then runs many simulated users concurrently. Each user registers,
+logs in and keeps issuing quote, buy, sell, index and history requests. Prints
+p50/p95/p99 latency and requests per second per route.
+
+    python benchmarks/load_test.py --users 50 --duration 30 --provider fake --latency 0.05
+    python benchmarks/load_test.py --provider replay --ticks benchmarks/ticks.csv
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYMBOLS = ["AAPL", "MSFT", "NFLX", "GOOGL", "AMZN"]
+
+# Relative weight of each action in a simulated user's session
+ACTIONS = [("quote", 3), ("buy", 2), ("sell", 1), ("index", 3), ("history", 1)]
+
+
+def start_server(tmp, args):
+    """Import the app against a copy of finance.db and serve it on a free port."""
+    db_path = os.path.join(tmp, "finance.db")
+    shutil.copy(os.path.join(ROOT, "finance.db"), db_path)
+
+    os.environ["FINANCE_DB"] = db_path
+    os.environ["QUOTE_PROVIDER"] = args.provider
+    os.environ["QUOTE_FAKE_LATENCY"] = str(args.latency)
+    os.environ["QUOTE_FAKE_JITTER"] = str(args.jitter)
+    if args.ticks:
+        os.environ["QUOTE_REPLAY_FILE"] = args.ticks
+    os.environ.setdefault("PRICE_FEED_INTERVAL", "0")
+
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class SimulatedUser(threading.Thread):
+    def __init__(self, base, index, deadline, record, seed):
+        super().__init__(daemon=True)
+        self.base = base
+        self.username = f"load-{os.getpid()}-{index}"
+        self.deadline = deadline
+        self.record = record
+        self.random = random.Random(seed)
+        self.http = requests.Session()
+        self.held = defaultdict(int)
+
+    def request(self, route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base + path, allow_redirects=False, timeout=60, **kwargs)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        self.record(route, time.perf_counter() - start, ok)
+
+    def run(self):
+        password = "load-test"
+        self.request("register", "POST", "/register",
+                     data={"username": self.username, "password": password, "confirmation": password})
+        self.request("login", "POST", "/login", data={"username": self.username, "password": password})
+
+        names, weights = zip(*ACTIONS)
+        while time.monotonic() < self.deadline:
+            action = self.random.choices(names, weights)[0]
+            symbol = self.random.choice(SYMBOLS)
+            if action == "quote":
+                self.request("quote", "POST", "/quote", data={"symbol": symbol})
+            elif action == "buy":
+                self.request("buy", "POST", "/buy", data={"symbol": symbol, "shares": "1"})
+                self.held[symbol] += 1
+            elif action == "sell" and self.held[symbol] > 0:
+                self.request("sell", "POST", "/sell", data={"symbol": symbol, "shares": "1"})
+                self.held[symbol] -= 1
+            elif action == "index":
+                self.request("index", "GET", "/")
+            elif action == "history":
+                self.request("history", "GET", "/history")
+
+
+def report(samples, errors, elapsed):
+    print(f"{'route':>10}  {'count':>7}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errors':>6}")
+    for route in sorted(samples):
+        times = sorted(samples[route])
+        if len(times) > 1:
+            cuts = statistics.quantiles(times, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = times[0]
+        print(f"{route:>10}  {len(times):7d}  {len(times) / elapsed:8.1f}  "
+              f"{p50 * 1000:8.1f}  {p95 * 1000:8.1f}  {p99 * 1000:8.1f}  {errors[route]:6d}")
+    total = sum(len(t) for t in samples.values())
+    print(f"{'total':>10}  {total:7d}  {total / elapsed:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load after login")
+    parser.add_argument("--provider", choices=["fake", "replay", "live"], default="fake")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake provider latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="fake provider extra random latency (s)")
+    parser.add_argument("--ticks", help="recorded ticks CSV for the replay provider")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.provider == "replay" and not args.ticks:
+        parser.error("--provider replay needs --ticks")
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def record(route, seconds, ok):
+        with lock:
+            samples[route].append(seconds)
+            if not ok:
+                errors[route] += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, base = start_server(tmp, args)
+        start = time.monotonic()
+        deadline = start + args.duration
+        users = [SimulatedUser(base, i, deadline, record, args.seed + i) for i in range(args.users)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - start
+        server.shutdown()
+
+    report(samples, errors, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Concurrency stress test for trade execution.
+
+Many threads buy shares for the same user at once. The "legacy" mode replays
+the old statement sequence (read cash, update cash, insert into tracking, each
+autocommitted with a rollback journal); the "pooled" mode runs the same trade
+through database.Database inside BEGIN IMMEDIATE, as app.buy does.
+
+    python benchmarks/stress_trades.py --threads 16 --trades 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from holdings import SCHEMA as HOLDINGS_SCHEMA, apply_trade  # noqa: E402
+
+SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, username TEXT NOT NULL, "
+    "hash TEXT NOT NULL, cash NUMERIC NOT NULL DEFAULT 10000.00)",
+    "CREATE TABLE tracking (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+    "symbol TEXT NOT NULL, shares INTEGER NOT NULL, price INTEGER NOT NULL, "
+    "purchase_time DATETIME DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY(user_id) REFERENCES users(id))",
+    "CREATE INDEX index_tracking ON tracking(user_id, symbol)",
+    HOLDINGS_SCHEMA,
+]
+
+PRICE = 10.0
+
+
+def create_db(path, cash):
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO users (username, hash, cash) VALUES ('stress', '', ?)", (cash,))
+    conn.commit()
+    conn.close()
+
+
+def legacy_buy(conn, user_id, shares):
+    rows = conn.execute("SELECT cash FROM users WHERE id = ?", (user_id,)).fetchall()
+    cash = rows[0][0]
+    total = shares * PRICE
+    if total > cash:
+        return False
+    time.sleep(0)  # the request thread can be preempted here, as it is under a real server
+    conn.execute("UPDATE users SET cash = cash - ? WHERE id = ?", (total, user_id))
+    conn.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                 (user_id, "TEST", shares, PRICE))
+    return True
+
+
+def pooled_buy(db, user_id, shares):
+    total = shares * PRICE
+    with db.transaction():
+        cash = db.execute("SELECT cash FROM users WHERE id = ?", user_id)[0]["cash"]
+        if total > cash:
+            return False
+        time.sleep(0)
+        db.execute("UPDATE users SET cash = cash - ? WHERE id = ?", total, user_id)
+        db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                   user_id, "TEST", shares, PRICE)
+        apply_trade(db, user_id, "TEST", shares, PRICE)
+    return True
+
+
+def run(mode, threads, trades, cash):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        create_db(path, cash)
+
+        db = Database(path)
+        filled = []
+        errors = []
+
+        def worker():
+            count = 0
+            conn = None
+            if mode == "legacy":
+                conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            try:
+                for _ in range(trades):
+                    if mode == "legacy":
+                        count += legacy_buy(conn, 1, 1)
+                    else:
+                        count += pooled_buy(db, 1, 1)
+            except sqlite3.Error as e:
+                errors.append(e)
+            finally:
+                if conn is not None:
+                    conn.close()
+            filled.append(count)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        check = sqlite3.connect(path)
+        final_cash = check.execute("SELECT cash FROM users WHERE id = 1").fetchone()[0]
+        spent = check.execute("SELECT COALESCE(SUM(shares * price), 0) FROM tracking").fetchone()[0]
+        check.close()
+        db.close()
+
+    attempted = threads * trades
+    return {
+        "mode": mode,
+        "attempted": attempted,
+        "filled": sum(filled),
+        "errors": len(errors),
+        "trades_per_sec": attempted / elapsed,
+        "final_cash": final_cash,
+        "overdraft": final_cash < 0 or spent > cash + 1e-9,
+        "ledger_mismatch": abs((cash - spent) - final_cash) > 1e-6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--trades", type=int, default=200, help="buy attempts per thread")
+    parser.add_argument("--cash", type=float, default=10000.0, help="starting cash; buys are one share at $10")
+    parser.add_argument("--mode", choices=["legacy", "pooled", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["legacy", "pooled"] if args.mode == "both" else [args.mode]
+    failed = False
+    for mode in modes:
+        result = run(mode, args.threads, args.trades, args.cash)
+        print(f"{result['mode']:>7}: {result['trades_per_sec']:8.0f} trades/s  "
+              f"filled={result['filled']}/{result['attempted']}  errors={result['errors']}  "
+              f"final_cash={result['final_cash']:.2f}  overdraft={result['overdraft']}  "
+              f"ledger_mismatch={result['ledger_mismatch']}")
+        if mode == "pooled":
+            failed = result["overdraft"] or result["ledger_mismatch"] or result["errors"] > 0
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import pytest
+
+from database import Database
+
+SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, username TEXT NOT NULL, "
+    "hash TEXT NOT NULL, cash NUMERIC NOT NULL DEFAULT 10000.00)",
+    "CREATE UNIQUE INDEX username ON users (username)",
+    "CREATE TABLE tracking (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+    "symbol TEXT NOT NULL, shares INTEGER NOT NULL, price INTEGER NOT NULL, "
+    "purchase_time DATETIME DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY(user_id) REFERENCES users(id))",
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A Database on a fresh file with finance.db's users and tracking tables"""
+    database = Database(str(tmp_path / "finance.db"))
+    for statement in SCHEMA:
+        database.execute(statement)
+    yield database
+    database.close()
@@ -0,0 +1,200 @@
+import sqlite3
+import threading
+import time
+import weakref
+
+from contextlib import contextmanager
+
+
+class _Lease:
+    """One thread's checkout of a pooled connection."""
+
+    __slots__ = ("conn", "finalizer", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.finalizer = None
+
+
+class Database:
+    """
+    Thin SQLite data-access layer.
+
+    A thread checks a WAL-mode connection out of the pool on its first
+    statement and keeps it until release() (called when each request's app
+    context ends) or until the thread exits, so readers never block the
+    writer and short-lived request threads reuse connections instead of
+    opening their own. At most `pool_size` idle connections are kept; extra
+    ones are closed when returned. Statements are prepared once per connection and reused
+    through sqlite3's statement cache. execute() mirrors cs50.SQL: SELECTs
+    return a list of dicts, INSERTs the new row id, UPDATE/DELETE the number
+    of rows changed, and constraint violations raise ValueError.
+
+    Observers added with add_observer() are called with (sql, seconds) after
+    every execute() and executemany().
+    """
+
+    def __init__(self, path, timeout=30.0, statement_cache=256, pool_size=16):
+        self.path = path
+        self.timeout = timeout
+        self.statement_cache = statement_cache
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._pool = []    # every open connection
+        self._idle = []    # open connections no thread has checked out
+        self._pool_lock = threading.Lock()
+        self._observers = []
+
+    def add_observer(self, observer):
+        """Call observer(sql, seconds) after each statement."""
+        self._observers.append(observer)
+
+    def _observe(self, sql, start):
+        elapsed = time.perf_counter() - start
+        for observer in self._observers:
+            observer(sql, elapsed)
+
+    def connection(self):
+        """Return this thread's connection, checking one out of the pool on first use."""
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            return lease.conn
+
+        with self._pool_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        lease = _Lease(conn)
+        # Returns the connection when the thread exits without calling release()
+        lease.finalizer = weakref.finalize(lease, self._checkin, conn)
+        lease.finalizer.atexit = False
+        self._local.lease = lease
+        self._local.depth = 0
+        return conn
+
+    def release(self):
+        """Return this thread's connection to the pool, unless it is inside a transaction."""
+        lease = getattr(self._local, "lease", None)
+        if lease is None or self._local.depth:
+            return
+        del self._local.lease
+        lease.finalizer()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,  # autocommit; transactions are explicit
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        with self._pool_lock:
+            self._pool.append(conn)
+        return conn
+
+    def _checkin(self, conn):
+        with self._pool_lock:
+            if conn not in self._pool:
+                return  # closed by close()
+            if len(self._idle) < self.pool_size:
+                # A thread that died mid-transaction must not hand its transaction on
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self._idle.append(conn)
+                return
+            self._pool.remove(conn)
+        conn.close()
+
+    def execute(self, sql, *args):
+        """Run one statement and return its result cs50-style."""
+        if not self._observers:
+            return self._execute(sql, args)
+        start = time.perf_counter()
+        try:
+            return self._execute(sql, args)
+        finally:
+            self._observe(sql, start)
+
+    def _execute(self, sql, args):
+        conn = self.connection()
+        try:
+            cursor = conn.execute(sql, args)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(str(e)) from e
+
+        if cursor.description is not None:
+            return [dict(row) for row in cursor.fetchall()]
+
+        verb = sql.lstrip().split(None, 1)[0].upper()
+        if verb in ("INSERT", "REPLACE"):
+            return cursor.lastrowid
+        if verb in ("UPDATE", "DELETE"):
+            return cursor.rowcount
+        return True
+
+    def executemany(self, sql, rows):
+        """Run one statement once per parameter tuple in rows; returns rows changed."""
+        start = time.perf_counter()
+        try:
+            return self.connection().executemany(sql, rows).rowcount
+        except sqlite3.IntegrityError as e:
+            raise ValueError(str(e)) from e
+        finally:
+            if self._observers:
+                self._observe(sql, start)
+
+    def iterate(self, sql, *args, batch_size=500):
+        """Yield rows of a SELECT one dict at a time, fetching in batches."""
+        cursor = self.connection().execute(sql, args)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the block in a BEGIN IMMEDIATE transaction.
+
+        The write lock is taken up front, so a read-check-write sequence inside
+        the block cannot interleave with another writer. Nested blocks join the
+        outermost transaction.
+        """
+        conn = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._pool_lock:
+            for conn in self._pool:
+                conn.close()
+            self._pool.clear()
+            self._idle.clear()
+        self._local = threading.local()
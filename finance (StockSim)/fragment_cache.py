@@ -0,0 +1,49 @@
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """
+    Per-user cache of rendered pages with their ETags.
+
+    Entries are grouped by user so one call drops everything a user's trade
+    may have changed. Callers should also key entries on the data the page
+    was rendered from, since invalidate() only reaches this process. The
+    least recently active users are evicted past `max_users`.
+    """
+
+    def __init__(self, max_users=1000, max_entries_per_user=32):
+        self.max_users = max_users
+        self.max_entries_per_user = max_entries_per_user
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, key):
+        """Return (etag, html) or None."""
+        with self._lock:
+            entries = self._users.get(user_id)
+            if entries is None:
+                return None
+            self._users.move_to_end(user_id)
+            return entries.get(key)
+
+    def put(self, user_id, key, html):
+        """Store html for the user and return its (etag, html) entry."""
+        entry = (hashlib.sha1(html.encode()).hexdigest(), html)
+        with self._lock:
+            entries = self._users.setdefault(user_id, OrderedDict())
+            self._users.move_to_end(user_id)
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries_per_user:
+                entries.popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id):
+        """Drop every cached page for the user."""
+        with self._lock:
+            self._users.pop(user_id, None)
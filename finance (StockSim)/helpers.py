@@ -1,8 +1,19 @@
+import asyncio
+import contextvars
+import os
 import requests
+import time
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from flask import redirect, render_template, session
 from functools import wraps
 
+from background_loop import BackgroundLoop
+from metrics import metrics
+from providers import VALID_SYMBOL, make_provider
+from quote_cache import QuoteCache
+from symbols import SymbolIndex
+
 
 def apology(message, code=400):
     """Render message as an apology to user."""
@@ -45,25 +56,196 @@ def login_required(f):
     return decorated_function
 
 
+# Shared quote cache in front of the upstream API (TTLs in seconds)
+quote_cache = QuoteCache(
+    ttl=float(os.environ.get("QUOTE_CACHE_TTL", 15)),
+    negative_ttl=float(os.environ.get("QUOTE_CACHE_NEGATIVE_TTL", 300)),
+    max_size=int(os.environ.get("QUOTE_CACHE_SIZE", 1024)),
+)
+
+# Local listing of known tickers for autocomplete. Lookups don't consult it:
+# a well-formed ticker missing from the listing goes to the quote API like any
+# other, and one the API doesn't know is negatively cached like any other
+SYMBOL_LISTING = os.environ.get("SYMBOL_LISTING", os.path.join(os.path.dirname(os.path.abspath(__file__)), "listings.csv"))
+symbol_index = SymbolIndex.load(SYMBOL_LISTING) if os.path.exists(SYMBOL_LISTING) else None
+
+# Bounded pool for concurrent quote fetches
+QUOTE_WORKERS = int(os.environ.get("QUOTE_WORKERS", 8))
+QUOTE_BATCH_DEADLINE = float(os.environ.get("QUOTE_BATCH_DEADLINE", 5))
+
+quote_pool = ThreadPoolExecutor(max_workers=QUOTE_WORKERS, thread_name_prefix="quote")
+
+# Upstream fetches run as coroutines on one background event loop, so waiting
+# on the quote API doesn't take a thread per request; QUOTE_ASYNC=0 goes back
+# to fetching on the calling thread and quote_pool
+QUOTE_ASYNC = os.environ.get("QUOTE_ASYNC", "1") != "0"
+
+quote_loop = BackgroundLoop(name="quotes")
+
+# Quotes the ASGI server fetched for the current request before running its
+# view (see asgi.py): symbol -> quote, or None for an invalid symbol
+prefetched_quotes = contextvars.ContextVar("prefetched_quotes", default=None)
+
+
+def provider_from_env():
+    """Build the quote provider selected by QUOTE_PROVIDER (live, replay or fake)."""
+    name = os.environ.get("QUOTE_PROVIDER", "live")
+    if name == "replay":
+        return make_provider(name, path=os.environ["QUOTE_REPLAY_FILE"])
+    if name == "fake":
+        return make_provider(name, latency=float(os.environ.get("QUOTE_FAKE_LATENCY", 0.05)),
+                             jitter=float(os.environ.get("QUOTE_FAKE_JITTER", 0)))
+    return make_provider(name, pool_size=QUOTE_WORKERS)
+
+
+quote_provider = provider_from_env()
+
+
+def set_provider(provider):
+    """Swap the quote provider, dropping quotes cached from the old one."""
+    global quote_provider
+    quote_provider = provider
+    quote_cache.invalidate()
+
+
 def lookup(symbol):
     """Look up quote for symbol."""
-    url = f"https://finance.cs50.io/quote?symbol={symbol.upper()}"
+    symbol = symbol.strip().upper()
+    if not VALID_SYMBOL.match(symbol):
+        # Malformed tickers never reach the cache or the quote API
+        return None
+    prefetched = prefetched_quotes.get()
+    if prefetched is not None and symbol in prefetched:
+        return prefetched[symbol]
+    start = time.perf_counter()
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for HTTP error responses
-        quote_data = response.json()
-        return {
-            "name": quote_data["companyName"],
-            "price": quote_data["latestPrice"],
-            "symbol": symbol.upper()
-        }
+        if QUOTE_ASYNC:
+            found, quote = quote_cache.peek(symbol)
+            return quote if found else quote_loop.run(lookup_async(symbol))
+        return quote_cache.get(symbol, _fetch_quote)
     except requests.RequestException as e:
         print(f"Request error: {e}")
-    except (KeyError, ValueError) as e:
-        print(f"Data parsing error: {e}")
+    finally:
+        metrics.observe_quotes(time.perf_counter() - start)
     return None
 
 
+async def lookup_async(symbol):
+    """Coroutine form of lookup(); must run on quote_loop."""
+    symbol = symbol.strip().upper()
+    if not VALID_SYMBOL.match(symbol):
+        # Malformed tickers never reach the cache or the quote API
+        return None
+    try:
+        return await quote_cache.get_async(symbol, _fetch_quote_async)
+    except requests.RequestException as e:
+        print(f"Request error: {e}")
+    return None
+
+
+async def _lookup_batch(symbols, deadline):
+    tasks = {symbol: asyncio.ensure_future(lookup_async(symbol)) for symbol in symbols}
+    done, _ = await asyncio.wait(tasks.values(), timeout=deadline)
+    # Stragglers keep running and still fill the cache when they land
+    return {symbol: task.result() for symbol, task in tasks.items()
+            if task in done and task.result() is not None}
+
+
+async def _prefetch(symbols, deadline):
+    tasks = {symbol: asyncio.ensure_future(lookup_async(symbol)) for symbol in symbols}
+    done, _ = await asyncio.wait(tasks.values(), timeout=deadline)
+    return {symbol: task.result() for symbol, task in tasks.items()
+            if task in done and task.exception() is None}
+
+
+async def prefetch_quotes(symbols, deadline=None):
+    """
+    Fetch quotes for symbols from any event loop without blocking it.
+
+    Returns symbol -> quote (None for invalid symbols) for every symbol that
+    resolved before the deadline; run the view with the result set in
+    prefetched_quotes and its lookups never wait on the network.
+    """
+    if deadline is None:
+        deadline = QUOTE_BATCH_DEADLINE
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if not symbols:
+        return {}
+    future = asyncio.run_coroutine_threadsafe(_prefetch(symbols, deadline), quote_loop.loop)
+    return await asyncio.wrap_future(future)
+
+
+def lookup_many(symbols, deadline=None):
+    """
+    Look up quotes for several symbols concurrently.
+
+    Returns a dict of symbol -> quote for every symbol that resolved before the
+    deadline (seconds). Symbols that are invalid, failed, or still in flight
+    when the deadline passes are left out, so callers get partial results.
+    """
+    if deadline is None:
+        deadline = QUOTE_BATCH_DEADLINE
+
+    start = time.perf_counter()
+    prefetched = prefetched_quotes.get() or {}
+    if QUOTE_ASYNC:
+        quotes = {}
+        missing = []
+        for symbol in dict.fromkeys(s.strip().upper() for s in symbols):
+            if symbol in prefetched:
+                found, quote = True, prefetched[symbol]
+            else:
+                found, quote = quote_cache.peek(symbol)
+            if not found:
+                missing.append(symbol)
+            elif quote is not None:
+                quotes[symbol] = quote
+        if missing:
+            quotes.update(quote_loop.run(_lookup_batch(missing, deadline)))
+        metrics.observe_quotes(time.perf_counter() - start)
+        return quotes
+
+    pending = {}
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in pending:
+            pending[symbol] = quote_pool.submit(lookup, symbol)
+
+    done, _ = wait(pending.values(), timeout=deadline)
+
+    quotes = {}
+    for symbol, future in pending.items():
+        if future in done and future.result() is not None:
+            quotes[symbol] = future.result()
+    metrics.observe_quotes(time.perf_counter() - start)
+    return quotes
+
+
+def _fetch_quote(symbol):
+    """Fetch a quote from the configured provider, bypassing the cache."""
+    provider = type(quote_provider).__name__
+    start = time.perf_counter()
+    try:
+        quote = quote_provider.fetch(symbol)
+    except Exception:
+        metrics.observe_upstream(provider, time.perf_counter() - start, ok=False)
+        raise
+    metrics.observe_upstream(provider, time.perf_counter() - start)
+    return quote
+
+
+async def _fetch_quote_async(symbol):
+    provider = type(quote_provider).__name__
+    start = time.perf_counter()
+    try:
+        quote = await quote_provider.fetch_async(symbol)
+    except Exception:
+        metrics.observe_upstream(provider, time.perf_counter() - start, ok=False)
+        raise
+    metrics.observe_upstream(provider, time.perf_counter() - start)
+    return quote
+
+
 def usd(value):
     """Format value as USD."""
     return f"${value:,.2f}"
@@ -0,0 +1,108 @@
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    user_id INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    shares INTEGER NOT NULL,
+    cost_basis REAL NOT NULL,
+    PRIMARY KEY(user_id, symbol),
+    FOREIGN KEY(user_id) REFERENCES users(id)
+)
+"""
+
+# Cost basis is tracked at average cost: a sale removes its share of the basis
+BUY_SQL = """
+INSERT INTO holdings (user_id, symbol, shares, cost_basis) VALUES (?, ?, ?, ?)
+ON CONFLICT(user_id, symbol) DO UPDATE SET
+    shares = shares + excluded.shares,
+    cost_basis = cost_basis + excluded.cost_basis
+"""
+
+SELL_SQL = """
+UPDATE holdings SET
+    cost_basis = CASE WHEN shares - ? <= 0 THEN 0 ELSE cost_basis * (shares - ?) / shares END,
+    shares = shares - ?
+WHERE user_id = ? AND symbol = ?
+"""
+
+
+def init_holdings(db):
+    """Create the holdings table, populating it from tracking the first time."""
+    exists = db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'holdings'")
+    db.execute(SCHEMA)
+    if not exists:
+        rebuild(db)
+
+
+def apply_trade(db, user_id, symbol, shares, price):
+    """
+    Apply one ledger entry to holdings.
+
+    Must run inside the same transaction as the matching tracking insert.
+    """
+    if shares > 0:
+        db.execute(BUY_SQL, user_id, symbol, shares, shares * price)
+    else:
+        sold = -shares
+        db.execute(SELL_SQL, sold, sold, sold, user_id, symbol)
+        db.execute("DELETE FROM holdings WHERE user_id = ? AND symbol = ? AND shares <= 0", user_id, symbol)
+
+
+def apply_trades(db, user_id, trades):
+    """
+    Apply many (symbol, shares, price) ledger entries with executemany.
+
+    Must run inside the same transaction as the matching tracking inserts.
+    Buys are applied before sells.
+    """
+    buys = [(user_id, symbol, shares, shares * price) for symbol, shares, price in trades if shares > 0]
+    sells = [(-shares, -shares, -shares, user_id, symbol) for symbol, shares, price in trades if shares < 0]
+    if buys:
+        db.executemany(BUY_SQL, buys)
+    if sells:
+        db.executemany(SELL_SQL, sells)
+        db.executemany("DELETE FROM holdings WHERE user_id = ? AND symbol = ? AND shares <= 0",
+                       [(user_id, symbol) for _, _, _, _, symbol in sells])
+
+
+def replay(db):
+    """Reconstruct holdings from the full tracking ledger."""
+    positions = {}
+    for row in db.execute("SELECT user_id, symbol, shares, price FROM tracking ORDER BY id"):
+        key = (row["user_id"], row["symbol"])
+        shares, cost = positions.get(key, (0, 0.0))
+        if row["shares"] > 0:
+            shares, cost = shares + row["shares"], cost + row["shares"] * row["price"]
+        else:
+            remaining = shares + row["shares"]
+            cost = cost * remaining / shares if remaining > 0 else 0.0
+            shares = remaining
+        positions[key] = (shares, cost)
+    return {key: value for key, value in positions.items() if value[0] > 0}
+
+
+def rebuild(db):
+    """Replace the holdings table contents with a replay of tracking."""
+    with db.transaction():
+        positions = replay(db)
+        db.execute("DELETE FROM holdings")
+        for (user_id, symbol), (shares, cost) in positions.items():
+            db.execute("INSERT INTO holdings (user_id, symbol, shares, cost_basis) VALUES (?, ?, ?, ?)",
+                       user_id, symbol, shares, cost)
+        return len(positions)
+
+
+def verify(db, tolerance=1e-6):
+    """Return a list of (user_id, symbol, expected, actual) rows that disagree with tracking."""
+    expected = replay(db)
+    actual = {
+        (row["user_id"], row["symbol"]): (row["shares"], row["cost_basis"])
+        for row in db.execute("SELECT user_id, symbol, shares, cost_basis FROM holdings")
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: (k[0], k[1])):
+        want = expected.get(key, (0, 0.0))
+        got = actual.get(key, (0, 0.0))
+        if want[0] != got[0] or abs(want[1] - got[1]) > tolerance:
+            mismatches.append((key[0], key[1], want, got))
+    return mismatches
@@ -0,0 +1,227 @@
+import random
+import threading
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # width[i] is how many positions next[i] is ahead of this node
+        self.width = [0] * level
+
+
+class RankedList:
+    """
+    Indexable skip list of unique, comparable keys.
+
+    Every forward link also stores how many positions it skips, so insert,
+    remove, rank-of-key and key-at-position all take O(log n) expected time.
+    """
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+        self._head = _Node(None, MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _random_level(self):
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.25:
+            level += 1
+        return level
+
+    def insert(self, key):
+        update = [self._head] * MAX_LEVEL
+        rank = [0] * MAX_LEVEL
+        x = self._head
+        for i in reversed(range(self._level)):
+            rank[i] = rank[i + 1] if i + 1 < self._level else 0
+            while x.next[i] is not None and x.next[i].key < key:
+                rank[i] += x.width[i]
+                x = x.next[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                self._head.width[i] = self._size
+            self._level = level
+
+        node = _Node(key, level)
+        for i in range(level):
+            node.next[i] = update[i].next[i]
+            update[i].next[i] = node
+            node.width[i] = update[i].width[i] - (rank[0] - rank[i])
+            update[i].width[i] = rank[0] - rank[i] + 1
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        update = [self._head] * MAX_LEVEL
+        x = self._head
+        for i in reversed(range(self._level)):
+            while x.next[i] is not None and x.next[i].key < key:
+                x = x.next[i]
+            update[i] = x
+
+        x = x.next[0]
+        if x is None or x.key != key:
+            raise KeyError(key)
+        for i in range(self._level):
+            if update[i].next[i] is x:
+                update[i].width[i] += x.width[i] - 1
+                update[i].next[i] = x.next[i]
+            else:
+                update[i].width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        """Return the 1-based position of key, or None if it is absent."""
+        x = self._head
+        position = 0
+        for i in reversed(range(self._level)):
+            while x.next[i] is not None and x.next[i].key <= key:
+                position += x.width[i]
+                x = x.next[i]
+        return position if x is not self._head and x.key == key else None
+
+    def slice(self, start, count):
+        """Return up to count keys starting at 0-based position start."""
+        x = self._head
+        traversed = 0
+        for i in reversed(range(self._level)):
+            while x.next[i] is not None and traversed + x.width[i] <= start:
+                traversed += x.width[i]
+                x = x.next[i]
+        keys = []
+        x = x.next[0]
+        while x is not None and len(keys) < count:
+            keys.append(x.key)
+            x = x.next[0]
+        return keys
+
+
+class Leaderboard:
+    """
+    Ranking of every user by total value (cash plus holdings at latest prices).
+
+    Each user's holdings and cash are kept in memory along with a reverse
+    index of who holds each symbol. A price change revalues only the holders
+    of that symbol and a trade only the trader, and users are kept ordered
+    in a RankedList keyed on (-value, user_id).
+    """
+
+    def __init__(self, db, prices=None):
+        self.db = db
+        self._lock = threading.Lock()
+        self._ranked = RankedList()
+        self._names = {}
+        self._cash = {}
+        self._holdings = {}
+        self._holders = {}
+        self._prices = {}
+        self._values = {}
+        self.load(prices or {})
+
+    def load(self, prices):
+        """Value every user from the database, pricing with prices (symbol -> quote)."""
+        with self._lock:
+            self._ranked = RankedList()
+            self._names.clear()
+            self._cash.clear()
+            self._holdings.clear()
+            self._holders.clear()
+            self._values.clear()
+            self._prices = {symbol.upper(): quote["price"] for symbol, quote in prices.items()}
+
+            for row in self.db.execute("SELECT id, username, cash FROM users"):
+                self._names[row["id"]] = row["username"]
+                self._cash[row["id"]] = row["cash"]
+                self._holdings[row["id"]] = {}
+            for row in self.db.execute("SELECT user_id, symbol, shares FROM holdings WHERE shares > 0"):
+                symbol = row["symbol"].upper()
+                self._holdings.setdefault(row["user_id"], {})[symbol] = row["shares"]
+                self._holders.setdefault(symbol, set()).add(row["user_id"])
+
+            for user_id in self._holdings:
+                self._revalue(user_id)
+
+    def _price(self, symbol):
+        # Caller holds self._lock. Symbols the feed hasn't priced yet fall back
+        # to their last traded price.
+        price = self._prices.get(symbol)
+        if price is None:
+            rows = self.db.execute(
+                "SELECT price FROM tracking WHERE symbol = ? ORDER BY id DESC LIMIT 1", symbol)
+            price = rows[0]["price"] if rows else 0.0
+            self._prices[symbol] = price
+        return price
+
+    def _revalue(self, user_id):
+        # Caller holds self._lock
+        value = self._cash.get(user_id, 0.0)
+        for symbol, shares in self._holdings.get(user_id, {}).items():
+            value += shares * self._price(symbol)
+
+        old = self._values.get(user_id)
+        if old == value:
+            return
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._ranked.insert((-value, user_id))
+        self._values[user_id] = value
+
+    def update_prices(self, quotes):
+        """Apply changed quotes (symbol -> quote) and revalue only their holders."""
+        with self._lock:
+            affected = set()
+            for symbol, quote in quotes.items():
+                symbol = symbol.upper()
+                self._prices[symbol] = quote["price"]
+                affected |= self._holders.get(symbol, set())
+            for user_id in affected:
+                self._revalue(user_id)
+
+    def refresh_user(self, user_id):
+        """Reload one user's cash and holdings after they trade, deposit or register."""
+        users = self.db.execute("SELECT username, cash FROM users WHERE id = ?", user_id)
+        rows = self.db.execute("SELECT symbol, shares FROM holdings WHERE user_id = ? AND shares > 0", user_id)
+        if not users:
+            return
+        with self._lock:
+            for symbol in self._holdings.get(user_id, {}):
+                self._holders.get(symbol, set()).discard(user_id)
+            holdings = {row["symbol"].upper(): row["shares"] for row in rows}
+            for symbol in holdings:
+                self._holders.setdefault(symbol, set()).add(user_id)
+            self._names[user_id] = users[0]["username"]
+            self._cash[user_id] = users[0]["cash"]
+            self._holdings[user_id] = holdings
+            self._revalue(user_id)
+
+    def top(self, n):
+        """Return the n most valuable users as {"rank", "user_id", "username", "value"} dicts."""
+        with self._lock:
+            keys = self._ranked.slice(0, n)
+            return [{"rank": i + 1, "user_id": user_id, "username": self._names[user_id], "value": -value}
+                    for i, (value, user_id) in enumerate(keys)]
+
+    def rank(self, user_id):
+        """Return (rank, value, total users), or None for an unknown user."""
+        with self._lock:
+            value = self._values.get(user_id)
+            if value is None:
+                return None
+            return self._ranked.rank((-value, user_id)), value, len(self._ranked)
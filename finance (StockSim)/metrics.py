@@ -0,0 +1,196 @@
+import re
+import threading
+import time
+
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the latency histogram buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Reduce a statement to its template.
+
+    Literals become ?, placeholder lists collapse to (?, ...) and whitespace
+    is squashed, so statements that differ only in values share one series.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?, ...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Caller holds the registry lock
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}"
+        yield f"{name}_sum{_labels(labels)} {self.sum}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class RequestTrace:
+    """Time spent in SQL and upstream quote calls during one request."""
+
+    __slots__ = ("start", "db_time", "db_calls", "quote_time", "quote_calls", "queries")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.db_calls = 0
+        self.quote_time = 0.0
+        self.quote_calls = 0
+        self.queries = {}
+
+    def summary(self, top=3):
+        slowest = sorted(self.queries.items(), key=lambda item: item[1], reverse=True)[:top]
+        parts = [f"db {self.db_time * 1000:.1f}ms in {self.db_calls} queries",
+                 f"quotes {self.quote_time * 1000:.1f}ms in {self.quote_calls} calls"]
+        parts += [f"{seconds * 1000:.1f}ms {sql}" for sql, seconds in slowest]
+        return "; ".join(parts)
+
+
+class Metrics:
+    """
+    In-process registry of request, SQL and upstream timings.
+
+    Request handlers call start_request()/end_request() around each request;
+    query and upstream timings are added to the registry and, when they run
+    on the request's thread, to that request's trace for the slow log.
+    render() returns everything in the Prometheus text exposition format.
+    """
+
+    def __init__(self, prefix="stocksim"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._templates = {}
+        self._requests = {}
+        self._statuses = {}
+        self._queries = {}
+        self._upstream = {}
+        self._upstream_errors = {}
+
+    def _template(self, sql):
+        template = self._templates.get(sql)
+        if template is None:
+            template = normalize_sql(sql)
+            if len(self._templates) < 4096:
+                self._templates[sql] = template
+        return template
+
+    def start_request(self):
+        self._local.trace = RequestTrace()
+
+    def end_request(self, route, method, status):
+        """Record the current request and return (seconds, trace), or None if none was started."""
+        trace = getattr(self._local, "trace", None)
+        if trace is None:
+            return None
+        self._local.trace = None
+        elapsed = time.perf_counter() - trace.start
+        with self._lock:
+            key = (route, method)
+            histogram = self._requests.get(key)
+            if histogram is None:
+                histogram = self._requests[key] = Histogram(REQUEST_BUCKETS)
+            histogram.observe(elapsed)
+            status_key = (route, method, str(status))
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+        return elapsed, trace
+
+    def observe_query(self, sql, seconds):
+        template = self._template(sql)
+        with self._lock:
+            histogram = self._queries.get(template)
+            if histogram is None:
+                histogram = self._queries[template] = Histogram(QUERY_BUCKETS)
+            histogram.observe(seconds)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.db_time += seconds
+            trace.db_calls += 1
+            trace.queries[template] = trace.queries.get(template, 0.0) + seconds
+
+    def observe_upstream(self, provider, seconds, ok=True):
+        with self._lock:
+            histogram = self._upstream.get(provider)
+            if histogram is None:
+                histogram = self._upstream[provider] = Histogram(REQUEST_BUCKETS)
+            histogram.observe(seconds)
+            if not ok:
+                self._upstream_errors[provider] = self._upstream_errors.get(provider, 0) + 1
+
+    def observe_quotes(self, seconds):
+        """Add quote lookup wall time to the current request's trace."""
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.quote_time += seconds
+            trace.quote_calls += 1
+
+    def render(self):
+        p = self.prefix
+        out = []
+        with self._lock:
+            out.append(f"# HELP {p}_request_duration_seconds Request latency by route.")
+            out.append(f"# TYPE {p}_request_duration_seconds histogram")
+            for (route, method), histogram in sorted(self._requests.items()):
+                out.extend(histogram.lines(f"{p}_request_duration_seconds", (("route", route), ("method", method))))
+
+            out.append(f"# HELP {p}_requests_total Requests by route and status.")
+            out.append(f"# TYPE {p}_requests_total counter")
+            for (route, method, status), count in sorted(self._statuses.items()):
+                out.append(f"{p}_requests_total{_labels((('route', route), ('method', method), ('status', status)))} {count}")
+
+            out.append(f"# HELP {p}_query_duration_seconds SQL statement latency by normalized statement.")
+            out.append(f"# TYPE {p}_query_duration_seconds histogram")
+            for template, histogram in sorted(self._queries.items()):
+                out.extend(histogram.lines(f"{p}_query_duration_seconds", (("query", template),)))
+
+            out.append(f"# HELP {p}_upstream_duration_seconds Quote provider call latency.")
+            out.append(f"# TYPE {p}_upstream_duration_seconds histogram")
+            for provider, histogram in sorted(self._upstream.items()):
+                out.extend(histogram.lines(f"{p}_upstream_duration_seconds", (("provider", provider),)))
+
+            out.append(f"# HELP {p}_upstream_errors_total Failed quote provider calls.")
+            out.append(f"# TYPE {p}_upstream_errors_total counter")
+            for provider in sorted(self._upstream):
+                count = self._upstream_errors.get(provider, 0)
+                out.append(f"{p}_upstream_errors_total{_labels((('provider', provider),))} {count}")
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+
+
+class PriceFeed:
+    """
+    Background price table for every symbol currently held by any user.
+
+    A daemon thread refreshes the distinct held symbols every `interval`
+    seconds through `fetch_many` and keeps the latest quote per symbol in
+    memory. Subscribers receive the quotes that changed on each refresh; at
+    most `max_subscribers` may be subscribed at once (None for no limit).
+    """
+
+    def __init__(self, db, fetch_many, interval=15.0, max_subscribers=None):
+        self.db = db
+        self.fetch_many = fetch_many
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.version = 0
+        self._quotes = {}
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def symbols(self):
+        """Return the union of symbols held across all users."""
+        rows = self.db.execute("SELECT DISTINCT symbol FROM holdings WHERE shares > 0")
+        return sorted({row["symbol"].upper() for row in rows})
+
+    def get(self, symbol):
+        with self._lock:
+            return self._quotes.get(symbol.upper())
+
+    def get_many(self, symbols):
+        """Return the known quotes for symbols; unknown symbols are left out."""
+        with self._lock:
+            return {s.upper(): self._quotes[s.upper()] for s in symbols if s.upper() in self._quotes}
+
+    def update(self, quotes):
+        """Merge fresh quotes into the table and notify subscribers of changes."""
+        changed = {}
+        with self._lock:
+            for symbol, quote in quotes.items():
+                old = self._quotes.get(symbol)
+                if old is None or old["price"] != quote["price"]:
+                    changed[symbol] = quote
+                self._quotes[symbol] = quote
+            if changed:
+                self.version += 1
+            subscribers = list(self._subscribers)
+
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    # One failing listener must not keep the others or subscribers from the change
+                    print(f"Price feed listener error: {e}")
+            for subscriber in subscribers:
+                subscriber.offer(changed)
+        return changed
+
+    def refresh(self):
+        """Fetch every held symbol once."""
+        symbols = self.symbols()
+        if not symbols:
+            return {}
+        with self._lock:
+            # Drop symbols nobody holds any more
+            for symbol in set(self._quotes) - set(symbols):
+                del self._quotes[symbol]
+        return self.update(self.fetch_many(symbols))
+
+    def add_listener(self, listener):
+        """Call listener(changed) synchronously after every update with changes."""
+        self._listeners.append(listener)
+
+    def subscribe(self, symbols=None, factory=None):
+        """Return a Subscription to changes in symbols (all if None), or None if max_subscribers are open."""
+        subscriber = (factory or Subscription)(self, symbols)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def start(self):
+        """Start the refresh thread (idempotent)."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="price-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Price feed error: {e}")
+            self._stop.wait(self.interval)
+
+
+class Subscription:
+    """
+    The latest unread quote per symbol for one listener.
+
+    Changes that arrive before the listener reads are merged into one pending
+    snapshot, so a slow listener skips intermediate prices but always gets
+    the newest, and its backlog never grows past one quote per symbol.
+    """
+
+    def __init__(self, feed, symbols):
+        self.feed = feed
+        self.symbols = {s.upper() for s in symbols} if symbols is not None else None
+        self._pending = {}
+        self._ready = threading.Condition()
+
+    def offer(self, changed):
+        if self.symbols is not None:
+            changed = {s: q for s, q in changed.items() if s in self.symbols}
+        if not changed:
+            return
+        with self._ready:
+            self._pending.update(changed)
+            self._ready.notify()
+
+    def get(self, timeout):
+        """Return every change since the last get; raises queue.Empty after timeout seconds without one."""
+        deadline = time.monotonic() + timeout
+        with self._ready:
+            while not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise queue.Empty
+                self._ready.wait(remaining)
+            changed, self._pending = self._pending, {}
+        return changed
+
+    def take(self):
+        """Return every change since the last get or take without waiting (possibly none)."""
+        with self._ready:
+            changed, self._pending = self._pending, {}
+        return changed
+
+    def close(self):
+        self.feed.unsubscribe(self)
@@ -0,0 +1,171 @@
+import mmap
+import os
+import threading
+
+import numpy as np
+
+from providers import VALID_SYMBOL
+
+TIME_DTYPE = np.dtype("<i8")   # milliseconds since the epoch
+PRICE_DTYPE = np.dtype("<f8")
+
+
+class PriceHistory:
+    """
+    Append-only columnar (timestamp, price) store, one pair of files per symbol.
+
+    <SYMBOL>.ts holds little-endian int64 millisecond timestamps and
+    <SYMBOL>.px the matching float64 prices. Appends go to the end of both
+    files; reads memory-map them, so range queries are a binary search over
+    the timestamp column without loading the file.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last = {}
+        self._maps = {}
+
+    def _paths(self, symbol):
+        symbol = symbol.upper()
+        if not VALID_SYMBOL.match(symbol):
+            raise ValueError(f"invalid symbol: {symbol}")
+        base = os.path.join(self.root, symbol)
+        return base + ".ts", base + ".px"
+
+    def append(self, symbol, timestamp, price):
+        """Record price at timestamp (seconds); out-of-order ticks are dropped."""
+        symbol = symbol.upper()
+        ts_path, px_path = self._paths(symbol)
+        millis = int(timestamp * 1000)
+        with self._lock:
+            last = self._last.get(symbol)
+            if last is None:
+                times, _ = self._columns(symbol)
+                last = int(times[-1]) if len(times) else -1
+            if millis < last:
+                return False
+            with open(ts_path, "ab") as ts_file, open(px_path, "ab") as px_file:
+                ts_file.write(np.array([millis], dtype=TIME_DTYPE).tobytes())
+                px_file.write(np.array([price], dtype=PRICE_DTYPE).tobytes())
+            self._last[symbol] = millis
+        return True
+
+    def record(self, quotes, timestamp):
+        """Append one tick per quote in a symbol -> quote mapping."""
+        for symbol, quote in quotes.items():
+            self.append(symbol, timestamp, quote["price"])
+
+    def _map(self, path):
+        # Caller holds self._lock. Remap only when the file has grown.
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+        cached = self._maps.get(path)
+        if cached is not None and cached[1] == size:
+            return cached[0]
+        if size == 0:
+            return None
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Old maps are left to the garbage collector; arrays handed out may still view them
+        self._maps[path] = (mapped, size)
+        return mapped
+
+    def _columns(self, symbol):
+        ts_path, px_path = self._paths(symbol)
+        ts_map, px_map = self._map(ts_path), self._map(px_path)
+        if ts_map is None or px_map is None:
+            return np.empty(0, TIME_DTYPE), np.empty(0, PRICE_DTYPE)
+        times = np.frombuffer(ts_map, dtype=TIME_DTYPE)
+        prices = np.frombuffer(px_map, dtype=PRICE_DTYPE)
+        # A crash between the two writes can leave one column a tick longer
+        n = min(len(times), len(prices))
+        return times[:n], prices[:n]
+
+    def columns(self, symbol):
+        """Return read-only (times_ms, prices) views over the whole history."""
+        with self._lock:
+            return self._columns(symbol)
+
+    def range(self, symbol, start, end):
+        """Return (times_ms, prices) for start <= t <= end (seconds)."""
+        times, prices = self.columns(symbol)
+        i = np.searchsorted(times, int(start * 1000), side="left")
+        j = np.searchsorted(times, int(end * 1000), side="right")
+        return times[i:j], prices[i:j]
+
+    def latest(self, symbol, when_ms):
+        """
+        Return (tick_ms, price) of the last tick at or before each timestamp (ms).
+
+        Timestamps before the first tick get tick_ms -1 and price NaN.
+        """
+        times, prices = self.columns(symbol)
+        if not len(times):
+            return np.full(len(when_ms), -1, TIME_DTYPE), np.full(len(when_ms), np.nan)
+        idx = np.searchsorted(times, when_ms, side="right") - 1
+        found = idx >= 0
+        idx = np.maximum(idx, 0)
+        return np.where(found, times[idx], -1), np.where(found, prices[idx], np.nan)
+
+
+def downsample(times, values, points):
+    """
+    Reduce a series to at most `points` samples for charting.
+
+    The span is cut into equal-width time buckets and the last sample in each
+    non-empty bucket is kept.
+    """
+    if len(times) <= points:
+        return times, values
+    edges = np.linspace(times[0], times[-1], points + 1)[1:]
+    idx = np.unique(np.searchsorted(times, edges, side="right") - 1)
+    return times[idx], values[idx]
+
+
+def portfolio_series(history, trades, start_ms, end_ms, points):
+    """
+    Value a user's holdings over [start_ms, end_ms] for charting.
+
+    trades is the user's ledger in order as (symbol, shares, price, time_ms)
+    rows. The series is evaluated at every tick of every traded symbol in the
+    window, using the shares held and the latest known price (tick or trade)
+    at each instant, then downsampled to `points`.
+    """
+    if not trades:
+        return np.empty(0, TIME_DTYPE), np.empty(0)
+
+    symbols = np.array([t[0].upper() for t in trades])
+    shares = np.array([t[1] for t in trades], dtype=float)
+    prices = np.array([t[2] for t in trades], dtype=float)
+    trade_ms = np.array([t[3] for t in trades], dtype=TIME_DTYPE)
+
+    names = np.unique(symbols)
+    parts = [trade_ms[(trade_ms >= start_ms) & (trade_ms <= end_ms)], np.array([end_ms], dtype=TIME_DTYPE)]
+    for name in names:
+        times, _ = history.range(name, start_ms / 1000, end_ms / 1000)
+        parts.append(times)
+    timeline = np.unique(np.concatenate(parts))
+
+    values = np.zeros(len(timeline))
+    for name in names:
+        mask = symbols == name
+        sym_ms, sym_px = trade_ms[mask], prices[mask]
+        held = np.cumsum(shares[mask])
+
+        idx = np.searchsorted(sym_ms, timeline, side="right") - 1
+        traded = idx >= 0
+        idx = np.maximum(idx, 0)
+        owned = np.where(traded, held[idx], 0.0)
+
+        # Prefer the tick price unless a trade happened more recently
+        tick_at, tick_px = history.latest(name, timeline)
+        trade_at = np.where(traded, sym_ms[idx], -1)
+        price = np.where(tick_at >= trade_at, tick_px, sym_px[idx])
+
+        values += np.where(owned > 0, owned * price, 0.0)
+
+    return downsample(timeline, values, points)
@@ -0,0 +1,168 @@
+import asyncio
+import csv
+import random
+import re
+import threading
+import time
+import zlib
+
+from abc import ABC, abstractmethod
+
+import httpx
+import requests
+
+from requests.adapters import HTTPAdapter
+
+VALID_SYMBOL = re.compile(r"^[A-Z][A-Z.\-]{0,9}$")
+
+
+class QuoteProvider(ABC):
+    """Source of stock quotes for helpers.lookup."""
+
+    @abstractmethod
+    def fetch(self, symbol):
+        """
+        Return {"name", "price", "symbol"} for an upper-case symbol.
+
+        Returns None for symbols the source does not know and raises
+        requests.RequestException for transient failures.
+        """
+
+    async def fetch_async(self, symbol):
+        """Coroutine form of fetch(); by default runs fetch() in a worker thread."""
+        return await asyncio.to_thread(self.fetch, symbol)
+
+
+class LiveProvider(QuoteProvider):
+    """
+    Quotes from the CS50 finance API over pooled keep-alive connections.
+
+    fetch() uses a requests session; fetch_async() an httpx AsyncClient
+    whose connection pool is shared by every coroutine on its event loop.
+    """
+
+    URL = "https://finance.cs50.io/quote"
+
+    def __init__(self, pool_size=8, timeout=10, async_pool_size=100):
+        self.timeout = timeout
+        self.async_pool_size = async_pool_size
+        self.http = requests.Session()
+        self.http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self._async_http = None
+
+    def fetch(self, symbol):
+        response = self.http.get(self.URL, params={"symbol": symbol}, timeout=self.timeout)
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            return None
+        response.raise_for_status()  # Raise an error for HTTP error responses
+        return self._parse(response, symbol)
+
+    async def fetch_async(self, symbol):
+        if self._async_http is None:
+            limits = httpx.Limits(max_connections=self.async_pool_size,
+                                  max_keepalive_connections=self.async_pool_size)
+            self._async_http = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        try:
+            response = await self._async_http.get(self.URL, params={"symbol": symbol})
+        except httpx.HTTPError as e:
+            # Callers handle transient failures as requests exceptions
+            raise requests.ConnectionError(str(e)) from e
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            return None
+        if response.status_code >= 400:
+            raise requests.HTTPError(f"{response.status_code} error from quote API for {symbol}")
+        return self._parse(response, symbol)
+
+    @staticmethod
+    def _parse(response, symbol):
+        try:
+            quote_data = response.json()
+            return {
+                "name": quote_data["companyName"],
+                "price": quote_data["latestPrice"],
+                "symbol": symbol
+            }
+        except (KeyError, ValueError) as e:
+            print(f"Data parsing error: {e}")
+        return None
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Deterministic quotes replayed from a recorded ticks file.
+
+    The file is CSV with a header of symbol,name,price. Each symbol's rows are
+    returned in file order, one per fetch, wrapping around at the end.
+    """
+
+    def __init__(self, path):
+        self.ticks = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                symbol = row["symbol"].strip().upper()
+                self.ticks.setdefault(symbol, []).append((row["name"], float(row["price"])))
+        self._position = {symbol: 0 for symbol in self.ticks}
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol):
+        ticks = self.ticks.get(symbol)
+        if not ticks:
+            return None
+        with self._lock:
+            index = self._position[symbol]
+            self._position[symbol] = (index + 1) % len(ticks)
+        name, price = ticks[index]
+        return {"name": name, "price": price, "symbol": symbol}
+
+    async def fetch_async(self, symbol):
+        return self.fetch(symbol)
+
+
+class FakeProvider(QuoteProvider):
+    """
+    Offline stand-in with configurable latency.
+
+    Every well-formed symbol has a stable made-up price. Each fetch sleeps for
+    `latency` seconds plus up to `jitter` more, and fails with a simulated
+    connection error at `error_rate`.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol):
+        delay, failed = self._draw()
+        time.sleep(delay)
+        return self._quote(symbol, failed)
+
+    async def fetch_async(self, symbol):
+        delay, failed = self._draw()
+        await asyncio.sleep(delay)
+        return self._quote(symbol, failed)
+
+    def _draw(self):
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter), self._random.random() < self.error_rate
+
+    def _quote(self, symbol, failed):
+        if failed:
+            raise requests.ConnectionError(f"simulated failure for {symbol}")
+        if not VALID_SYMBOL.match(symbol):
+            return None
+        price = 5 + zlib.crc32(symbol.encode()) % 50000 / 100
+        return {"name": f"{symbol} Inc.", "price": price, "symbol": symbol}
+
+
+def make_provider(name, **options):
+    """Build a provider by name: live, replay or fake."""
+    if name == "live":
+        return LiveProvider(**options)
+    if name == "replay":
+        return ReplayProvider(**options)
+    if name == "fake":
+        return FakeProvider(**options)
+    raise ValueError(f"unknown quote provider: {name}")
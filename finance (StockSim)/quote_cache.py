@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class _Flight:
+    """An upstream fetch that other callers for the same key can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    """
+    Thread-safe TTL + LRU cache for quotes.
+
+    Valid quotes live for `ttl` seconds, invalid symbols (loader returned None)
+    for `negative_ttl` seconds. Concurrent misses on the same key share a single
+    call to the loader (single-flight). A loader that raises is not cached; the
+    error is re-raised to every caller waiting on that fetch.
+
+    get_async() is the same for coroutine loaders. Its in-flight fetches are
+    coalesced with each other but not with get()'s, so it should only be
+    called from one event loop.
+    """
+
+    def __init__(self, ttl=15.0, negative_ttl=300.0, max_size=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    def _cached(self, key):
+        # Caller holds self._lock. Returns (found, value) and counts hits.
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires > self._clock():
+                self._entries.move_to_end(key)
+                self._stats["hits" if value is not None else "negative_hits"] += 1
+                return True, value
+            del self._entries[key]
+        return False, None
+
+    def peek(self, key):
+        """Return (True, value) if key is cached and fresh, else (False, None)."""
+        with self._lock:
+            return self._cached(key)
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader(key) on a miss."""
+        with self._lock:
+            found, value = self._cached(key)
+            if found:
+                return value
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader(key)
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+                del self._flights[key]
+            flight.done.set()
+            raise
+
+        with self._lock:
+            self._store(key, flight.value)
+            del self._flights[key]
+        flight.done.set()
+        return flight.value
+
+    async def get_async(self, key, loader):
+        """Return the cached value for key, awaiting loader(key) on a miss."""
+        with self._lock:
+            found, value = self._cached(key)
+            if found:
+                return value
+
+            future = self._async_flights.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+                self._stats["misses"] += 1
+                leader = True
+
+        if not leader:
+            # A follower giving up must not cancel the shared fetch
+            return await asyncio.shield(future)
+
+        try:
+            value = await loader(key)
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                del self._async_flights[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # followers may all have gone; don't warn about it
+            raise
+
+        with self._lock:
+            self._store(key, value)
+            del self._async_flights[key]
+        future.set_result(value)
+        return value
+
+    def put(self, key, value):
+        """Insert or refresh a value without going through a loader."""
+        with self._lock:
+            self._store(key, value)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return a snapshot of the hit/miss counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = (stats["hits"] + stats["negative_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _store(self, key, value):
+        # Caller holds self._lock
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (value, self._clock() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
@@ -0,0 +1,188 @@
+import secrets
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries the session id."""
+
+    def __init__(self, initial=None, sid=None, expires=0.0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface, ABC):
+    """
+    Base class for server-side session stores.
+
+    Subclasses implement load/save/delete on serialized session data. Entries
+    expire `lifetime` seconds after they were last written; the expiry is
+    pushed forward once less than half of it remains, so an active user is
+    not logged out but every request does not cost a write.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, lifetime=None):
+        self.lifetime = lifetime
+
+    @abstractmethod
+    def load(self, sid, now):
+        """Return (data, expires) for a live session, or None."""
+
+    @abstractmethod
+    def save(self, sid, data, expires):
+        """Store serialized data for sid until expires."""
+
+    @abstractmethod
+    def delete(self, sid):
+        """Forget sid."""
+
+    def _lifetime(self, app):
+        if self.lifetime is not None:
+            return self.lifetime
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.load(sid, time.time())
+            if entry is not None:
+                data, expires = entry
+                return ServerSideSession(self.serializer.loads(data), sid=sid, expires=expires)
+        return ServerSideSession(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = self._lifetime(app)
+        if session.modified or session.expires - now < lifetime / 2:
+            session.expires = now + lifetime
+            self.save(session.sid, self.serializer.dumps(dict(session)), session.expires)
+        elif not self.should_set_cookie(app, session):
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+class MemorySessionInterface(ServerSideSessionInterface):
+    """In-process LRU session store for single-node deployments."""
+
+    def __init__(self, max_entries=10000, lifetime=None):
+        super().__init__(lifetime)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid, now):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry
+
+    def save(self, sid, data, expires):
+        with self._lock:
+            self._entries[sid] = (data, expires)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class SQLiteSessionInterface(ServerSideSessionInterface):
+    """
+    SQLite session store shared by every worker process using the database.
+
+    Expired rows are removed by a background sweeper that range-scans the
+    expiry index.
+    """
+
+    def __init__(self, db, lifetime=None, sweep_interval=300.0):
+        super().__init__(lifetime)
+        self.db = db
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+        self._stop = threading.Event()
+
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY NOT NULL,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires)")
+
+    def load(self, sid, now):
+        rows = self.db.execute("SELECT data, expires FROM sessions WHERE sid = ? AND expires > ?", sid, now)
+        if not rows:
+            return None
+        return rows[0]["data"], rows[0]["expires"]
+
+    def save(self, sid, data, expires):
+        self.db.execute(
+            "INSERT INTO sessions (sid, data, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+            sid, data, expires)
+
+    def delete(self, sid):
+        self.db.execute("DELETE FROM sessions WHERE sid = ?", sid)
+
+    def sweep(self):
+        """Delete expired sessions and return how many were removed."""
+        return self.db.execute("DELETE FROM sessions WHERE expires <= ?", time.time())
+
+    def start_sweeper(self):
+        """Start the periodic sweeper thread (idempotent)."""
+        if self._sweeper is not None:
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Session sweep error: {e}")
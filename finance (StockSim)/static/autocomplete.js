@@ -0,0 +1,34 @@
+// Suggest tickers from the local symbol index while typing into #symbol
+(() => {
+    const input = document.getElementById("symbol");
+    const options = document.getElementById("symbol_options");
+    if (!input || !options) return;
+
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener("input", () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const prefix = input.value.trim();
+            if (!prefix) {
+                options.replaceChildren();
+                return;
+            }
+            if (controller) controller.abort();
+            controller = new AbortController();
+            try {
+                const res = await fetch(`/api/symbols?prefix=${encodeURIComponent(prefix)}`, { signal: controller.signal });
+                const matches = await res.json();
+                options.replaceChildren(...matches.map((m) => {
+                    const option = document.createElement("option");
+                    option.value = m.symbol;
+                    option.label = m.name;
+                    return option;
+                }));
+            } catch (err) {
+                if (err.name !== "AbortError") console.error(err);
+            }
+        }, 100);
+    });
+})();
@@ -0,0 +1,79 @@
+import bisect
+import csv
+
+
+class SymbolIndex:
+    """
+    In-memory index of known symbols and company names for autocomplete.
+
+    Symbols and lower-cased company names are kept in sorted arrays, so an
+    exact lookup or a prefix search is a binary search plus a short scan.
+    """
+
+    def __init__(self, listings):
+        by_symbol = {}
+        for symbol, name in listings:
+            symbol = symbol.strip().upper()
+            if symbol:
+                by_symbol[symbol] = name.strip()
+
+        self._names = by_symbol
+        self._symbols = sorted(by_symbol)
+        by_name = []
+        for symbol, name in by_symbol.items():
+            name = name.lower()
+            by_name.append((name, symbol))
+            if name.startswith("the "):
+                by_name.append((name[4:], symbol))
+        self._by_name = sorted(by_name)
+
+    def add(self, symbol, name):
+        """Add a symbol that is missing from the listing."""
+        symbol = symbol.strip().upper()
+        if not symbol or symbol in self._names:
+            return
+        self._names[symbol] = name
+        bisect.insort(self._symbols, symbol)
+        bisect.insort(self._by_name, (name.lower(), symbol))
+
+    @classmethod
+    def load(cls, path):
+        """Build an index from a CSV with symbol,name columns."""
+        with open(path, newline="") as f:
+            return cls((row["symbol"], row["name"]) for row in csv.DictReader(f))
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol.strip().upper() in self._names
+
+    def name(self, symbol):
+        return self._names.get(symbol.strip().upper())
+
+    def search(self, prefix, limit=10):
+        """
+        Return up to `limit` {"symbol", "name"} matches for prefix.
+
+        Ticker matches come first, then company-name matches.
+        """
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+
+        matches = []
+        upper = prefix.upper()
+        i = bisect.bisect_left(self._symbols, upper)
+        while i < len(self._symbols) and len(matches) < limit and self._symbols[i].startswith(upper):
+            matches.append(self._symbols[i])
+            i += 1
+
+        lower = prefix.lower()
+        i = bisect.bisect_left(self._by_name, (lower,))
+        while i < len(self._by_name) and len(matches) < limit and self._by_name[i][0].startswith(lower):
+            symbol = self._by_name[i][1]
+            if symbol not in matches:
+                matches.append(symbol)
+            i += 1
+
+        return [{"symbol": symbol, "name": self._names[symbol]} for symbol in matches]
@@ -0,0 +1,110 @@
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from analytics import LedgerAnalytics, compute_ledger
+
+
+class LedgerDB:
+    """Stands in for the cs50 SQL handle with an in-memory tracking ledger"""
+
+    def __init__(self, trades):
+        self.rows = [{"id": i + 1, "symbol": s, "shares": q, "price": p} for i, (s, q, p) in enumerate(trades)]
+
+    def execute(self, query, user_id, *args):
+        if query.startswith("SELECT MAX(id)"):
+            return [{"last_id": self.rows[-1]["id"] if self.rows else None}]
+        return [row for row in self.rows if row["id"] <= args[0]]
+
+
+def random_ledger(seed, symbols="ABCDEFG", trades=200):
+    rng = random.Random(seed)
+    held = {}
+    ledger = []
+    for _ in range(trades):
+        symbol = rng.choice(symbols)
+        price = round(rng.uniform(1, 500), 2)
+        if held.get(symbol, 0) > 0 and rng.random() < 0.4:
+            shares = -rng.randint(1, held[symbol])
+        else:
+            shares = rng.randint(1, 100)
+        held[symbol] = held.get(symbol, 0) + shares
+        ledger.append((symbol, shares, price))
+    return ledger
+
+
+def fifo_lots(ledger):
+    """Naive FIFO: a queue of [shares, price] lots per symbol, consumed oldest first"""
+    lots, realized = {}, {}
+    for symbol, shares, price in ledger:
+        queue = lots.setdefault(symbol, deque())
+        realized.setdefault(symbol, 0.0)
+        if shares > 0:
+            queue.append([shares, price])
+            continue
+        to_sell = -shares
+        while to_sell:
+            lot = queue[0]
+            taken = min(lot[0], to_sell)
+            realized[symbol] += taken * (price - lot[1])
+            lot[0] -= taken
+            to_sell -= taken
+            if not lot[0]:
+                queue.popleft()
+    return lots, realized
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fifo_matches_lot_queue(seed):
+    ledger = random_ledger(seed)
+    lots, realized = fifo_lots(ledger)
+    prices = {symbol: round(random.Random(seed).uniform(1, 500), 2) for symbol in lots}
+
+    report = LedgerAnalytics(LedgerDB(ledger)).report(1, prices)
+    by_symbol = {position["symbol"]: position for position in report["positions"]}
+    assert sorted(by_symbol) == sorted(lots)
+
+    for symbol, queue in lots.items():
+        position = by_symbol[symbol]
+        held = sum(q for q, _ in queue)
+        cost = sum(q * p for q, p in queue)
+        assert position["shares"] == held
+        assert position["cost_basis"] == pytest.approx(cost, abs=1e-6)
+        assert position["realized"] == pytest.approx(realized[symbol], abs=1e-6)
+        assert position["unrealized"] == pytest.approx(held * prices[symbol] - cost, abs=1e-6)
+
+    assert report["totals"]["realized"] == pytest.approx(sum(realized.values()), abs=1e-6)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_time_weighted_return_matches_full_revaluation(seed):
+    ledger = random_ledger(seed, trades=80)
+    symbols, shares, price = zip(*ledger)
+    result = compute_ledger(list(symbols), np.array(shares), np.array(price))
+
+    # Revalue every position at each trade's last prices
+    positions, last = {}, {}
+    growth = 1.0
+    for symbol, q, p in ledger:
+        start = sum(positions[s] * last[s] for s in positions)
+        last[symbol] = p
+        end = sum(positions[s] * last[s] for s in positions)
+        if start > 0:
+            growth *= end / start
+        positions[symbol] = positions.get(symbol, 0) + q
+
+    assert result["growth"] == pytest.approx(growth, rel=1e-9)
+    assert result["final_start_value"] == pytest.approx(sum(positions[s] * last[s] for s in positions), rel=1e-9)
+
+
+def test_unpriced_symbols_use_last_trade_price():
+    ledger = [("AAA", 10, 5.0), ("BBB", 4, 20.0), ("AAA", -5, 8.0), ("BBB", 2, 30.0)]
+    report = LedgerAnalytics(LedgerDB(ledger)).report(1, {})
+    by_symbol = {position["symbol"]: position for position in report["positions"]}
+
+    assert by_symbol["AAA"]["price"] == 8.0
+    assert by_symbol["AAA"]["realized"] == pytest.approx(15.0)
+    assert by_symbol["BBB"]["market_value"] == pytest.approx(180.0)
+    assert by_symbol["BBB"]["unrealized"] == pytest.approx(40.0)
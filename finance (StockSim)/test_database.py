@@ -0,0 +1,135 @@
+import os
+import threading
+
+import pytest
+
+from database import Database
+
+
+def make_db(tmp_path, **kwargs):
+    db = Database(os.path.join(tmp_path, "test.db"), **kwargs)
+    db.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, value INTEGER)")
+    db.release()
+    return db
+
+
+def run_in_thread(fn):
+    thread = threading.Thread(target=fn)
+    thread.start()
+    thread.join()
+
+
+def test_released_connections_are_reused_across_threads(tmp_path):
+    db = make_db(tmp_path)
+
+    def request():
+        db.execute("SELECT * FROM t")
+        db.release()
+
+    for _ in range(50):
+        run_in_thread(request)
+    assert len(db._pool) == 1
+    assert len(db._idle) == 1
+
+
+def test_exiting_thread_returns_its_connection(tmp_path):
+    db = make_db(tmp_path)
+    for _ in range(50):
+        run_in_thread(lambda: db.execute("SELECT * FROM t"))
+    assert len(db._pool) == 1
+
+
+def test_idle_connections_beyond_pool_size_are_closed(tmp_path):
+    db = make_db(tmp_path, pool_size=2)
+    started = threading.Barrier(5)
+    finish = threading.Event()
+
+    def hold():
+        db.execute("SELECT * FROM t")
+        started.wait()
+        finish.wait(5)
+        db.release()
+
+    threads = [threading.Thread(target=hold) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    assert len(db._pool) == 4
+    finish.set()
+    for thread in threads:
+        thread.join()
+    assert len(db._idle) == 2
+    assert len(db._pool) == 2
+
+
+def test_release_inside_transaction_keeps_the_connection(tmp_path):
+    db = make_db(tmp_path)
+    with db.transaction() as conn:
+        db.release()
+        assert db.connection() is conn
+        db.execute("INSERT INTO t (value) VALUES (1)")
+    db.release()
+    assert db.execute("SELECT value FROM t") == [{"value": 1}]
+
+
+def test_thread_dying_mid_transaction_rolls_back(tmp_path):
+    db = make_db(tmp_path)
+
+    def abandon():
+        db.connection().execute("BEGIN IMMEDIATE")
+        db.execute("INSERT INTO t (value) VALUES (1)")
+
+    run_in_thread(abandon)
+    assert db.execute("SELECT * FROM t") == []
+
+
+def test_transaction_commits(tmp_path):
+    db = make_db(tmp_path)
+    with db.transaction():
+        db.execute("INSERT INTO t (value) VALUES (1)")
+    assert db.execute("SELECT value FROM t") == [{"value": 1}]
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    db = make_db(tmp_path)
+    try:
+        with db.transaction():
+            db.execute("INSERT INTO t (value) VALUES (1)")
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert db.execute("SELECT * FROM t") == []
+    assert not db.connection().in_transaction
+
+
+def test_nested_transactions_join_the_outermost(tmp_path):
+    db = make_db(tmp_path)
+    try:
+        with db.transaction():
+            db.execute("INSERT INTO t (value) VALUES (1)")
+            with db.transaction():
+                db.execute("INSERT INTO t (value) VALUES (2)")
+            # the inner block finishing doesn't commit
+            assert db.connection().in_transaction
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert db.execute("SELECT * FROM t") == []
+
+    with db.transaction():
+        with db.transaction():
+            db.execute("INSERT INTO t (value) VALUES (3)")
+    assert db.execute("SELECT value FROM t") == [{"value": 3}]
+
+
+def test_execute_results_and_constraint_errors(tmp_path):
+    db = make_db(tmp_path)
+    db.execute("CREATE UNIQUE INDEX t_value ON t (value)")
+
+    assert db.execute("INSERT INTO t (value) VALUES (?)", 5) == 1
+    assert db.execute("UPDATE t SET value = value + 1") == 1
+    assert db.execute("SELECT value FROM t") == [{"value": 6}]
+    with pytest.raises(ValueError):
+        db.execute("INSERT INTO t (value) VALUES (6)")
+    assert db.executemany("INSERT INTO t (value) VALUES (?)", [(7,), (8,)]) == 2
+    assert [row["value"] for row in db.iterate("SELECT value FROM t ORDER BY value", batch_size=1)] == [6, 7, 8]
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from holdings import apply_trade, apply_trades, init_holdings, rebuild, verify
+
+
+def record(db, user_id, symbol, shares, price):
+    """Insert a ledger entry and apply it to holdings in one transaction, as the trade routes do"""
+    with db.transaction():
+        db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                   user_id, symbol, shares, price)
+        apply_trade(db, user_id, symbol, shares, price)
+
+
+def holdings(db):
+    return {(row["user_id"], row["symbol"]): (row["shares"], row["cost_basis"])
+            for row in db.execute("SELECT user_id, symbol, shares, cost_basis FROM holdings")}
+
+
+def random_trades(seed, count=300):
+    rng = random.Random(seed)
+    held = {}
+    for _ in range(count):
+        key = (rng.randint(1, 3), rng.choice(["AAPL", "MSFT", "NFLX"]))
+        price = round(rng.uniform(1, 300), 2)
+        if held.get(key, 0) > 0 and rng.random() < 0.4:
+            shares = -rng.randint(1, held[key])
+        else:
+            shares = rng.randint(1, 20)
+        held[key] = held.get(key, 0) + shares
+        yield key[0], key[1], shares, price
+
+
+def test_buys_accumulate_and_sells_scale_cost_basis(db):
+    init_holdings(db)
+    record(db, 1, "AAPL", 10, 5.0)
+    record(db, 1, "AAPL", 10, 15.0)
+    record(db, 1, "AAPL", -5, 20.0)
+
+    shares, cost = holdings(db)[(1, "AAPL")]
+    assert shares == 15
+    assert cost == pytest.approx(150.0)   # average cost 10, a quarter of 200 sold
+
+
+def test_selling_everything_removes_the_row(db):
+    init_holdings(db)
+    record(db, 1, "AAPL", 4, 5.0)
+    record(db, 1, "AAPL", -4, 6.0)
+    assert holdings(db) == {}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_holdings_match_a_replay(db, seed):
+    init_holdings(db)
+    for trade in random_trades(seed):
+        record(db, *trade)
+
+    assert verify(db) == []
+    incremental = holdings(db)
+    assert rebuild(db) == len(incremental)
+    assert holdings(db) == pytest.approx(incremental)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_apply_trades_matches_apply_trade(db, seed):
+    init_holdings(db)
+    # Batches as bulk orders make them: one trade per symbol, buys before sells
+    rng = random.Random(seed)
+    for _ in range(30):
+        rows = db.execute("SELECT symbol, shares FROM holdings WHERE user_id = 1")
+        held = {row["symbol"]: row["shares"] for row in rows}
+        trades = []
+        for symbol in rng.sample(["AAPL", "MSFT", "NFLX", "TSLA"], 3):
+            price = round(rng.uniform(1, 300), 2)
+            if held.get(symbol, 0) and rng.random() < 0.5:
+                trades.append((symbol, -rng.randint(1, held[symbol]), price))
+            else:
+                trades.append((symbol, rng.randint(1, 20), price))
+        with db.transaction():
+            db.executemany("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                           [(1, symbol, shares, price) for symbol, shares, price in trades])
+            apply_trades(db, 1, trades)
+
+    assert verify(db) == []
+
+
+def test_verify_reports_drift_and_rebuild_repairs_it(db):
+    init_holdings(db)
+    record(db, 1, "AAPL", 10, 5.0)
+    record(db, 2, "MSFT", 3, 100.0)
+    db.execute("UPDATE holdings SET shares = 7 WHERE user_id = 1")
+    db.execute("DELETE FROM holdings WHERE user_id = 2")
+
+    assert verify(db) == [(1, "AAPL", (10, 50.0), (7, 50.0)), (2, "MSFT", (3, 300.0), (0, 0.0))]
+    rebuild(db)
+    assert verify(db) == []
+
+
+def test_init_populates_from_an_existing_ledger(db):
+    for user_id, symbol, shares, price in [(1, "AAPL", 5, 10.0), (1, "AAPL", -2, 12.0), (2, "MSFT", 1, 50.0)]:
+        db.execute("INSERT INTO tracking (user_id, symbol, shares, price) VALUES (?, ?, ?, ?)",
+                   user_id, symbol, shares, price)
+    init_holdings(db)
+
+    assert holdings(db) == {(1, "AAPL"): (3, pytest.approx(30.0)), (2, "MSFT"): (1, 50.0)}
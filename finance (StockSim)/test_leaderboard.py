@@ -0,0 +1,74 @@
+import bisect
+import random
+
+import pytest
+
+from leaderboard import RankedList
+
+
+def check_against(ranked, reference, rng):
+    assert len(ranked) == len(reference)
+    assert ranked.slice(0, len(reference) + 1) == reference
+    for position, key in enumerate(reference):
+        assert ranked.rank(key) == position + 1
+    for _ in range(5):
+        start = rng.randrange(len(reference) + 2)
+        count = rng.randrange(1, 20)
+        assert ranked.slice(start, count) == reference[start:start + count]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_sorted_list_under_random_operations(seed):
+    rng = random.Random(seed)
+    ranked = RankedList(seed=seed)
+    reference = []
+    values = {}
+
+    for step in range(2000):
+        op = rng.random()
+        if op < 0.45 or not values:
+            # New user joins with a value
+            user_id = len(values) + step * 1000
+            key = (-round(rng.uniform(0, 20000), 2), user_id)
+            values[user_id] = key
+            ranked.insert(key)
+            bisect.insort(reference, key)
+        elif op < 0.8:
+            # Value changes: the leaderboard removes the old key and inserts the new one
+            user_id = rng.choice(list(values))
+            old = values[user_id]
+            new = (-round(rng.uniform(0, 20000), 2), user_id)
+            ranked.remove(old)
+            reference.remove(old)
+            ranked.insert(new)
+            bisect.insort(reference, new)
+            values[user_id] = new
+        else:
+            user_id = rng.choice(list(values))
+            key = values.pop(user_id)
+            ranked.remove(key)
+            reference.remove(key)
+
+        if step % 100 == 0:
+            check_against(ranked, reference, rng)
+
+    check_against(ranked, reference, rng)
+
+
+def test_missing_keys():
+    ranked = RankedList(seed=1)
+    for key in (3, 1, 2):
+        ranked.insert(key)
+
+    assert ranked.rank(4) is None
+    assert ranked.rank(0) is None
+    with pytest.raises(KeyError):
+        ranked.remove(5)
+    assert ranked.slice(0, 10) == [1, 2, 3]
+
+
+def test_empty():
+    ranked = RankedList()
+    assert len(ranked) == 0
+    assert ranked.rank(1) is None
+    assert ranked.slice(0, 5) == []
@@ -0,0 +1,123 @@
+import importlib
+import os
+import shutil
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope="module")
+def stocksim(tmp_path_factory):
+    """The app module on a copy of finance.db, priced by the offline fake provider"""
+    tmp = tmp_path_factory.mktemp("stocksim")
+    shutil.copy(os.path.join(HERE, "finance.db"), tmp / "finance.db")
+    os.environ.update({
+        "FINANCE_DB": str(tmp / "finance.db"),
+        "PRICE_HISTORY_DIR": str(tmp / "history"),
+        "PRICE_FEED_INTERVAL": "0",
+        "QUOTE_PROVIDER": "fake",
+        "QUOTE_FAKE_LATENCY": "0",
+    })
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def user(stocksim):
+    """A fresh user with $1,000,000 cash, logged in on a test client"""
+    user_id = stocksim.db.execute("INSERT INTO users (username, hash, cash) VALUES (?, 'x', 1000000)",
+                                  f"orders-{os.urandom(4).hex()}")
+    client = stocksim.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return user_id, client
+
+
+def state(stocksim, user_id):
+    db = stocksim.db
+    return (
+        db.execute("SELECT cash FROM users WHERE id = ?", user_id)[0]["cash"],
+        db.execute("SELECT symbol, shares, price FROM tracking WHERE user_id = ? ORDER BY id", user_id),
+        db.execute("SELECT symbol, shares FROM holdings WHERE user_id = ? ORDER BY symbol", user_id),
+    )
+
+
+def price(stocksim, symbol):
+    return stocksim.lookup(symbol)["price"]
+
+
+def test_filled_batch_updates_cash_ledger_and_holdings(stocksim, user):
+    user_id, client = user
+    response = client.post("/api/orders", json={"orders": [
+        {"symbol": "aapl", "side": "buy", "shares": 2},
+        {"symbol": "MSFT", "side": "buy", "shares": 1},
+    ]})
+
+    assert response.status_code == 200
+    cost = 2 * price(stocksim, "AAPL") + price(stocksim, "MSFT")
+    cash, tracking, holdings = state(stocksim, user_id)
+    assert cash == pytest.approx(1_000_000 - cost)
+    assert response.get_json()["cash"] == pytest.approx(cash)
+    assert [(row["symbol"], row["shares"]) for row in tracking] == [("AAPL", 2), ("MSFT", 1)]
+    assert [(row["symbol"], row["shares"]) for row in holdings] == [("AAPL", 2), ("MSFT", 1)]
+
+
+def test_buys_are_recorded_before_sells(stocksim, user):
+    user_id, client = user
+    response = client.post("/api/orders", json={"orders": [
+        {"symbol": "AAPL", "side": "sell", "shares": 1},
+        {"symbol": "AAPL", "side": "buy", "shares": 1},
+    ]})
+
+    assert response.status_code == 200
+    _, tracking, holdings = state(stocksim, user_id)
+    assert [row["shares"] for row in tracking] == [1, -1]
+    assert holdings == []
+
+
+@pytest.mark.parametrize("orders, error", [
+    ([{"symbol": "AAPL", "side": "buy", "shares": 1}, {"symbol": "MSFT", "side": "buy", "shares": 10**9}],
+     "lack of funds to make these purchases"),
+    ([{"symbol": "AAPL", "side": "buy", "shares": 1}, {"symbol": "MSFT", "side": "sell", "shares": 1}],
+     "shares not enough"),
+    ([{"symbol": "AAPL", "side": "buy", "shares": 1}, {"symbol": "!!!", "side": "buy", "shares": 1}],
+     "order 1: invalid stock symbol"),
+    ([{"symbol": "AAPL", "side": "buy", "shares": 1}, {"symbol": "MSFT", "side": "hold", "shares": 1}],
+     "order 1: side must be buy or sell"),
+    ([{"symbol": "AAPL", "side": "buy", "shares": 1}, {"symbol": "MSFT", "side": "buy", "shares": True}],
+     "order 1: please provide a positive integer"),
+])
+def test_rejected_batch_changes_nothing(stocksim, user, orders, error):
+    user_id, client = user
+    before = state(stocksim, user_id)
+    response = client.post("/api/orders", json={"orders": orders})
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+    assert state(stocksim, user_id) == before
+
+
+def test_failure_while_writing_rolls_back_the_whole_batch(stocksim, user, monkeypatch):
+    user_id, client = user
+    before = state(stocksim, user_id)
+
+    def fail(*args):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(stocksim, "apply_trades", fail)
+    response = client.post("/api/orders", json={"orders": [
+        {"symbol": "AAPL", "side": "buy", "shares": 1},
+        {"symbol": "MSFT", "side": "buy", "shares": 1},
+    ]})
+
+    assert response.status_code == 500
+    assert state(stocksim, user_id) == before
+
+
+@pytest.mark.parametrize("body", ['[{"symbol": "AAPL"}]', '"orders"', "5", "null", "{not json", '{"orders": {}}',
+                                  '{"orders": []}'])
+def test_malformed_bodies_are_400(stocksim, user, body):
+    _, client = user
+    response = client.post("/api/orders", data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from quote_cache import QuoteCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def quote(symbol):
+    return {"symbol": symbol, "price": 1.0}
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = QuoteCache()
+    release = threading.Event()
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        release.wait(5)
+        return quote(key)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("AAPL", loader))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats()["coalesced"] == 19)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["AAPL"]
+    assert len(results) == 20 and all(result is results[0] for result in results)
+    assert cache.stats()["misses"] == 1
+
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached():
+    cache = QuoteCache()
+    release = threading.Event()
+    errors = []
+
+    def loader(key):
+        release.wait(5)
+        raise ConnectionError("upstream down")
+
+    def call():
+        try:
+            cache.get("AAPL", loader)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats()["coalesced"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 5
+    assert cache.peek("AAPL") == (False, None)
+    assert cache.get("AAPL", quote) == quote("AAPL")
+
+
+def test_async_misses_share_one_fetch():
+    cache = QuoteCache()
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return quote(key)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_async("MSFT", loader) for _ in range(20)))
+
+    results = asyncio.run(main())
+    assert calls == ["MSFT"]
+    assert all(result == quote("MSFT") for result in results)
+    assert cache.stats()["coalesced"] == 19
+
+
+def test_ttl_and_negative_ttl():
+    clock = Clock()
+    cache = QuoteCache(ttl=15, negative_ttl=300, clock=clock)
+    cache.get("AAPL", quote)
+    cache.get("ZZZZ", lambda key: None)
+
+    clock.now = 14.9
+    assert cache.peek("AAPL") == (True, quote("AAPL"))
+    clock.now = 15.0
+    assert cache.peek("AAPL") == (False, None)
+    assert cache.peek("ZZZZ") == (True, None)
+    clock.now = 300.0
+    assert cache.peek("ZZZZ") == (False, None)
+
+
+def test_zero_ttl_caches_nothing():
+    cache = QuoteCache(ttl=0, negative_ttl=0)
+    calls = []
+    for _ in range(3):
+        cache.get("AAPL", lambda key: calls.append(key) or quote(key))
+    assert len(calls) == 3
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = QuoteCache(max_size=3)
+    for symbol in ("A", "B", "C"):
+        cache.put(symbol, quote(symbol))
+    cache.peek("A")
+    cache.put("D", quote("D"))
+
+    assert cache.peek("B") == (False, None)
+    assert [cache.peek(symbol)[0] for symbol in ("A", "C", "D")] == [True, True, True]
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("key", ["AAPL", None])
+def test_invalidate(key):
+    cache = QuoteCache()
+    cache.put("AAPL", quote("AAPL"))
+    cache.put("MSFT", quote("MSFT"))
+    cache.invalidate(key)
+
+    assert cache.peek("AAPL") == (False, None)
+    assert cache.peek("MSFT")[0] is (key is not None)